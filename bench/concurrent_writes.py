@@ -0,0 +1,119 @@
+import argparse, multiprocessing, os, sys, tempfile, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from stats_utils import (
+    load_progress, update_card_result, serialize_progress, atomic_write, get_db_file,
+    ProgressWriter, SAVE_EVERY_ANSWER, _apply_result,
+)
+
+# -------------------------------------------------------
+# Several processes answering cards of one folder at once
+#
+#   python bench/concurrent_writes.py [--processes 6] [--answers 300] [--baseline]
+#
+# Every process loads the folder's progress, then hammers update_card_result:
+# even processes save synchronously, odd ones through a ProgressWriter.
+# All of them use the same device id (two windows on one machine, the
+# hard case for merging). Afterwards the stored counts must add up to
+# every answer given. --baseline also runs the old way of saving (each
+# process writes its whole DB) to show the lost updates.
+# -------------------------------------------------------
+
+FOLDER = "stress"
+GENERATORS = 5
+INSTANCES = 3   # per generator, shared by all processes
+
+
+def card(k):
+    return {"topic": f"{FOLDER}.topic", "_func_name": f"gen{k % GENERATORS}",
+            "name": f"gen{k % GENERATORS}_inst{k % INSTANCES}"}
+
+
+def answer(k):
+    return k % 3 != 0
+
+
+def worker(i, answers, start, baseline):
+    os.environ["PROCKNOW_DEVICE"] = "shared"
+    while time.time() < start:
+        time.sleep(0.001)
+    db = load_progress(FOLDER)
+
+    if baseline:
+        for k in range(answers):
+            _apply_result(db, card(k), answer(k), "wrong", time.time())
+            atomic_write(get_db_file(FOLDER), serialize_progress(db))
+        return
+
+    writer = ProgressWriter(SAVE_EVERY_ANSWER) if i % 2 else None
+    for k in range(answers):
+        update_card_result(card(k), db, answer(k), "wrong", writer, FOLDER)
+    if writer is not None:
+        writer.close()
+
+
+def run(processes, answers, baseline):
+    ctx = multiprocessing.get_context("spawn")
+    start = time.time() + 2.0   # spawned interpreters need a moment to start
+    procs = [ctx.Process(target=worker, args=(i, answers, start, baseline)) for i in range(processes)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    return time.time() - start
+
+
+def check(processes, answers):
+    """Answers missing from the generator counts, and the keys of records that are off."""
+    expected_gen, expected_inst = {}, {}
+    for k in range(answers):
+        c = card(k)
+        slot = 0 if answer(k) else 1
+        for table, key in ((expected_gen, f"{c['topic']}.{c['_func_name']}"),
+                           (expected_inst, f"{c['topic']}.{c['name']}")):
+            counts = table.setdefault(key, [0, 0])
+            counts[slot] += processes
+
+    db = load_progress(FOLDER)
+    lost, off = 0, []
+    for name, expected in (("generators", expected_gen), ("instances", expected_inst)):
+        for key, (c, w) in expected.items():
+            rec = db[name].get(key, {})
+            got = (rec.get("correct", 0), rec.get("wrong", 0))
+            days = [sum(d[0] for d in dev.values()) + sum(d[1] for d in dev.values())
+                    for dev in rec.get("days", {}).values()]
+            if got != (c, w) or (name == "generators" and sum(days) != c + w):
+                off.append(key)
+                if name == "generators":   # every answer counts once per generator
+                    lost += c + w - sum(got)
+    return lost, off
+
+
+def main(processes, answers, baseline):
+    total = processes * answers
+    modes = [("merge-on-write", False)] + ([("whole-DB writes", True)] if baseline else [])
+    ok = True
+    for label, old_way in modes:
+        with tempfile.TemporaryDirectory() as tmp:
+            cwd = os.getcwd()
+            os.chdir(tmp)
+            try:
+                elapsed = run(processes, answers, old_way)
+                lost, off = check(processes, answers)
+            finally:
+                os.chdir(cwd)
+        print(f"{label:<16} {processes} processes x {answers} answers: "
+              f"{total - lost}/{total} counted, {len(off)} records off ({elapsed:.1f}s)")
+        if not old_way:
+            ok = not off
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stress concurrent progress writes.")
+    parser.add_argument("--processes", type=int, default=6)
+    parser.add_argument("--answers", type=int, default=300)
+    parser.add_argument("--baseline", action="store_true", help="also run whole-DB writes")
+    args = parser.parse_args()
+    sys.exit(0 if main(args.processes, args.answers, args.baseline) else 1)
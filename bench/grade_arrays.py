@@ -0,0 +1,57 @@
+import argparse, os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+from card_utils import compare_arrays, compare_detail, parse_array, _expected_array
+
+# -------------------------------------------------------
+# Grading vector/matrix answers
+#
+#   python bench/grade_arrays.py [--size 1000] [--repeat 50]
+#
+# Times the elementwise check on an already parsed size x size answer
+# (what grading costs), parsing the typed answer, and compare_detail end
+# to end, for a right answer and one with a few wrong elements.
+# -------------------------------------------------------
+
+
+def timed(func, repeat):
+    func()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - t0) / repeat * 1000
+
+
+def main(size, repeat):
+    rnd = np.random.default_rng(0)
+    answer = rnd.normal(size=(size, size))
+    right = answer + rnd.uniform(-1e-7, 1e-7, answer.shape)
+    wrong = right.copy()
+    wrong.flat[rnd.choice(answer.size, 7, replace=False)] += 1.0
+    typed = "; ".join(" ".join(repr(x) for x in row) for row in right.tolist())
+
+    print(f"{size}x{size} matrix, {answer.size:,} elements, ms per answer")
+    for comparison in ("tol=1e-6", "tol=1e-6, rtol=1e-4"):
+        card = {"data_type": "matrix", "answer": answer, "comparison": comparison}
+        expected, bound = _expected_array(card)
+        t_right = timed(lambda: compare_arrays(right, expected, bound), repeat)
+        t_wrong = timed(lambda: compare_arrays(wrong, expected, bound), repeat)
+        print(f"  {comparison:<20} grade right {t_right:8.3f}   grade wrong {t_wrong:8.3f}")
+
+    card = {"data_type": "matrix", "answer": answer, "comparison": "tol=1e-6"}
+    assert compare_detail(typed, card)[0]
+    t_parse = timed(lambda: parse_array(typed), max(1, repeat // 10))
+    t_total = timed(lambda: compare_detail(typed, card), max(1, repeat // 10))
+    print(f"  parse typed answer {t_parse:8.1f}   compare_detail end to end {t_total:8.1f}")
+    print(" ", compare_detail("; ".join(" ".join(map(repr, row)) for row in wrong.tolist()), card)[1][:120])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark vector/matrix grading.")
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    main(args.size, args.repeat)
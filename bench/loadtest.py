@@ -0,0 +1,122 @@
+import argparse, asyncio, json, statistics, time
+
+# -------------------------------------------------------
+# Load test for server.py
+#
+#   python server.py &
+#   python bench/loadtest.py --sessions 300 --rounds 20
+#
+# Every virtual learner opens a keep-alive connection, starts a session
+# and answers `rounds` cards (fetching the math images like a browser).
+# Progress goes to progress_<folder>.<user>.json in the server's folder,
+# learners are spread over --users names.
+# -------------------------------------------------------
+
+
+class Client:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, body=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        payload = json.dumps(body).encode() if body is not None else b""
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n")
+        self.writer.write(head.encode("latin-1") + payload)
+        await self.writer.drain()
+
+        raw = await self.reader.readuntil(b"\r\n\r\n")
+        lines = raw.decode("latin-1").split("\r\n")
+        status = int(lines[0].split(" ")[1])
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                k, v = line.split(":", 1)
+                headers[k.strip().lower()] = v.strip()
+        data = await self.reader.readexactly(int(headers.get("content-length", 0)))
+        if headers.get("connection", "").lower() == "close":
+            self.writer.close()
+            self.writer = None
+        return status, headers.get("content-type", ""), data
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def learner(i, args, latencies, errors):
+    client = Client(args.host, args.port)
+    seen_math = set()
+
+    async def timed(method, path, body=None):
+        t0 = time.perf_counter()
+        status, ctype, data = await client.request(method, path, body)
+        latencies.append(time.perf_counter() - t0)
+        if status != 200:
+            errors.append((path, status, data[:200]))
+            return None
+        return json.loads(data) if ctype.startswith("application/json") else data
+
+    async def fetch_math(card):
+        # a browser caches images by URL, so only fetch each formula once
+        for part in card.get("question", []):
+            if "math" in part and part["math"] not in seen_math:
+                seen_math.add(part["math"])
+                await timed("GET", part["math"])
+
+    try:
+        d = await timed("POST", "/api/session", {
+            "user": f"load{i % args.users}", "folder": args.folder, "topic": args.topic,
+        })
+        if d is None:
+            return
+        sid, card = d["session"], d["card"]
+        for _ in range(args.rounds):
+            if card["done"]:
+                break
+            await fetch_math(card)
+            await timed("POST", f"/api/session/{sid}/answer", {"answer": "42"})
+            d = await timed("POST", f"/api/session/{sid}/verdict", {"override": False})
+            if d is None:
+                return
+            card = d["card"]
+    except Exception as e:
+        errors.append(("connection", type(e).__name__, str(e)))
+    finally:
+        client.close()
+
+
+async def main(args):
+    latencies, errors = [], []
+    t0 = time.perf_counter()
+    await asyncio.gather(*(learner(i, args, latencies, errors) for i in range(args.sessions)))
+    elapsed = time.perf_counter() - t0
+
+    if not latencies:
+        print("No requests succeeded.")
+        return
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+    print(f"sessions:   {args.sessions}")
+    print(f"requests:   {len(latencies)} in {elapsed:.2f}s ({len(latencies) / elapsed:.0f} req/s)")
+    print(f"latency ms: p50 {pct(0.50):.1f}  p95 {pct(0.95):.1f}  p99 {pct(0.99):.1f}  "
+          f"max {latencies[-1] * 1000:.1f}  mean {statistics.mean(latencies) * 1000:.1f}")
+    print(f"errors:     {len(errors)}")
+    for e in errors[:10]:
+        print("  ", e)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hammer a running server.py with concurrent sessions.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=10, help="cards answered per session")
+    parser.add_argument("--users", type=int, default=10, help="distinct user names to spread sessions over")
+    parser.add_argument("--folder", default="demo")
+    parser.add_argument("--topic", default="arithmetic_demo")
+    asyncio.run(main(parser.parse_args()))
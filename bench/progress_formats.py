@@ -0,0 +1,82 @@
+import argparse, os, random, sys, tempfile, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from stats_utils import (
+    new_db, new_record, load_progress, set_progress_format, serialize_progress, atomic_write,
+    get_db_file, get_snapshot_file, progress_format, INSTANCE_RETENTION, _pack_progress,
+)
+
+# -------------------------------------------------------
+# Load/save time and file size of the progress formats
+#
+#   python bench/progress_formats.py [--sizes 10000 100000 1000000]
+#
+# Builds synthetic DBs with the given number of instance records (one
+# generator per INSTANCE_RETENTION instances) and runs in a temp folder.
+# Save times cover serializing and writing; save_progress adds a re-read
+# of the stored file and a merge on top.
+# -------------------------------------------------------
+
+
+def synthetic_db(n_instances):
+    rnd = random.Random(n_instances)
+    db = new_db()
+    devices = ["laptop", "workstation"]
+    now = time.time()
+    for i in range(n_instances):
+        gen = f"topic{i % 97}.chapter.generator_{i // INSTANCE_RETENTION}"
+        key = f"topic{i % 97}.chapter.card_{i}_{rnd.randint(0, 99)}"
+        db["seq"] += 1
+        rec = new_record()
+        c, w = rnd.randint(0, 20), rnd.randint(0, 5)
+        rec["devices"] = {rnd.choice(devices): [c, w]}
+        rec["correct"], rec["wrong"] = c, w
+        rec["wrong_log"] = [[now - rnd.random() * 1e6, str(rnd.randint(0, 999))] for _ in range(min(w, 2))]
+        rec["seq"] = db["seq"]
+        rec["generator"] = gen
+        rec["last"] = now - rnd.random() * 1e6
+        db["instances"][key] = rec
+        if gen not in db["generators"]:
+            g = new_record()
+            g["devices"] = {"laptop": [c, w]}
+            g["correct"], g["wrong"] = c, w
+            db["generators"][gen] = g
+    return db
+
+
+def write_progress(folder, db):
+    """Serialize and write in the folder's format, without save_progress's re-read and merge."""
+    atomic_write(*_pack_progress(folder, serialize_progress(db, progress_format(folder))))
+
+
+def timed(func, *args):
+    t0 = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - t0, result
+
+
+def main(sizes, formats):
+    print(f"{'records':>9} {'format':>6} {'save s':>8} {'load s':>8} {'size MB':>9}")
+    for n in sizes:
+        db = synthetic_db(n)
+        for fmt in formats:
+            folder = f"bench{n}"
+            set_progress_format(folder, fmt)
+            t_save, _ = timed(write_progress, folder, db)
+            t_load, loaded = timed(load_progress, folder)
+            assert loaded["seq"] == db["seq"] and len(loaded["instances"]) == n
+            path = get_db_file(folder) if progress_format(folder) == "json" else get_snapshot_file(folder)
+            size = os.path.getsize(path) / 1e6
+            print(f"{n:>9} {fmt:>6} {t_save:>8.3f} {t_load:>8.3f} {size:>9.2f}")
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark progress file formats.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--formats", nargs="+", default=["json", "zlib", "lzma"])
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        main(args.sizes, args.formats)
@@ -0,0 +1,93 @@
+import argparse, os, random, sys, time
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from PIL import Image
+
+from card_utils import compose_text, split_math, is_math
+
+# -------------------------------------------------------
+# Rendering a math-heavy question: one figure per formula (the old way,
+# one widget per part) against compose_text (one pass, one widget).
+#
+#   python bench/render_question.py [--questions 20] [--formulas 12]
+# -------------------------------------------------------
+
+
+def render_with_figure(latex_str, max_width=500, fontsize=16):
+    """The previous renderer: one pyplot figure and savefig per fragment."""
+    latex_str = latex_str.strip("$")
+    fig = plt.figure(figsize=(0.01, 0.01))
+    fig.patch.set_alpha(0)
+    plt.text(0.5, 0.5, f"${latex_str}$", fontsize=fontsize, ha="center", va="center")
+    plt.axis("off")
+    buf = BytesIO()
+    plt.savefig(buf, format="png", dpi=150, bbox_inches="tight", pad_inches=0.1, transparent=True)
+    plt.close(fig)
+    buf.seek(0)
+    img = Image.open(buf).convert("RGBA")
+    bbox = img.getbbox()
+    if bbox:
+        img = img.crop(bbox)
+    if img.width > max_width:
+        scale = max_width / img.width
+        img = img.resize((max_width, int(img.height * scale)), Image.LANCZOS)
+    return img
+
+
+def make_question(rnd, n_formulas):
+    parts = []
+    for _ in range(n_formulas):
+        a, b = rnd.randint(1, 99), rnd.randint(1, 99)
+        parts.append(rnd.choice([
+            f"$ {a} + {b} $",
+            f"$x_{{{a}}}^{{{b}}}$",
+            f"$\\frac{{{a}}}{{{b}}}$",
+            f"$\\sqrt{{{a}^2+{b}^2}}$",
+            f"$\\text{{gcd}}({a},{b})$",
+        ]))
+    return "Compare " + ", then ".join(parts) + " and answer."
+
+
+def main(n_questions, n_formulas):
+    rnd = random.Random(0)
+    questions = [make_question(rnd, n_formulas) for _ in range(n_questions)]
+    render_with_figure("$warm up$")
+    compose_text("$warm up$")
+
+    t0 = time.perf_counter()
+    widgets_old = 0
+    for q in questions:
+        for part in split_math(q):
+            widgets_old += 1
+            if is_math(part):
+                render_with_figure(part)
+    t_old = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for q in questions:
+        compose_text(q)
+    t_new = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for q in questions:
+        compose_text(q)
+    t_cached = time.perf_counter() - t0
+
+    print(f"{n_questions} questions with {n_formulas} formulas each")
+    print(f"per-fragment figures: {t_old / n_questions * 1000:8.1f} ms/question, "
+          f"{widgets_old / n_questions:.0f} widgets/question")
+    print(f"single pass:          {t_new / n_questions * 1000:8.1f} ms/question, 1 widget/question")
+    print(f"single pass, cached:  {t_cached / n_questions * 1000:8.3f} ms/question")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark question rendering.")
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--formulas", type=int, default=12)
+    args = parser.parse_args()
+    main(args.questions, args.formulas)
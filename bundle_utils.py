@@ -0,0 +1,289 @@
+import argparse
+import json
+import random
+import threading
+import time
+import zipfile
+from concurrent.futures import Future
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from card_utils import (
+    ASYNC_TIMEOUT, list_topics, import_topic, generator_names, submit_card,
+    use_worker_pool, render_math_batch, split_math, is_math,
+)
+from stats_utils import atomic_write
+
+# -----------------------------------------------
+# Deck bundles: a folder compiled into one zip file
+#
+#   python bundle_utils.py build demo -n 20 -o deck_demo.zip
+#   python bundle_utils.py info deck_demo.zip
+#   python main.py deck_demo.zip         (or server.py --bundle deck_demo.zip)
+#
+# A bundle holds up to n instances of every generator (seeded, so a seed
+# finds its card again) and all their formulas as PNGs. Drilling from it
+# opens that one file; no module under learn/ is imported or run.
+#
+#   manifest.json   format, folder, build settings, topics -> generators
+#   cards.json      topic -> generator -> [card, ...]
+#   math/<n>.png    formulas, listed in the manifest per font size
+# -----------------------------------------------
+
+BUNDLE_FORMAT = "procknow-bundle"
+BUNDLE_VERSION = 1
+
+INSTANCES = 20
+# formula layouts the app and the server ask for: questions at 16, hints at 13
+MATH_WIDTH = 500
+MATH_SIZES = (16, 13)
+MATH_DPI = 150
+
+# card keys kept besides the generator's own (which lose "_"-prefixed caches)
+KEPT_PRIVATE = ("_func_name", "_seed")
+
+
+def get_bundle_file(folder_name):
+    """Default file name of a folder's bundle."""
+    return f"deck_{folder_name}.zip"
+
+
+def _plain(value):
+    """json.dumps fallback for numpy values in cards."""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} cannot be stored in a bundle")
+
+
+def portable_card(card):
+    """The card as JSON-ready data: no caches, numpy values as lists and numbers."""
+    data = {k: v for k, v in card.items() if not k.startswith("_") or k in KEPT_PRIVATE}
+    return json.loads(json.dumps(data, default=_plain))
+
+
+def _math_key(fragment, fontsize):
+    return f"{fontsize}:{fragment}"
+
+
+# -------------------------------------------------------
+# Building
+# -------------------------------------------------------
+
+def generate_instances(folder, n=INSTANCES, seed=None):
+    """
+    topic -> generator -> up to `n` different cards (constant generators
+    give one). Cards are compared whole, as some generators keep the name
+    and vary the content. Seeds are drawn from `seed`, so a bundle can be
+    built again card for card.
+    """
+    rnd = random.Random(seed)
+    jobs = []
+    for topic in list_topics(folder):
+        full_topic = f"{folder}.{topic}"
+        mod = import_topic(full_topic)
+        for name in generator_names(mod):
+            for _ in range(n):
+                jobs.append((full_topic, name, submit_card(full_topic, name, mod, rnd.getrandbits(32))))
+
+    cards, failed, seen = {}, set(), set()
+    for full_topic, name, fut in jobs:
+        gens = cards.setdefault(full_topic.split(".", 1)[1], {})
+        try:
+            card = fut.result(ASYNC_TIMEOUT + 5)
+        except Exception as e:
+            if (full_topic, name) not in failed:   # helpers fail on every call
+                print("Error in card", f"{full_topic}.{name}", e)
+                failed.add((full_topic, name))
+            continue
+        if card is None:
+            continue
+        try:
+            card = portable_card(card)
+        except TypeError as e:
+            print("Skipped card", f"{full_topic}.{name}", e)
+            continue
+        instances = gens.setdefault(name, [])
+        content = json.dumps({k: v for k, v in card.items() if k != "_seed"}, sort_keys=True)
+        if (full_topic, name, content) not in seen:
+            seen.add((full_topic, name, content))
+            instances.append(card)
+    return cards
+
+
+def build_bundle(folder, path=None, n=INSTANCES, seed=None):
+    """Compile `folder` into a bundle file. Returns its manifest."""
+    path = path or get_bundle_file(folder)
+    seed = seed if seed is not None else random.getrandbits(32)
+    cards = generate_instances(folder, n, seed)
+
+    fragments = sorted({
+        part
+        for gens in cards.values() for instances in gens.values() for card in instances
+        for key in ("question", "hint") if isinstance(card.get(key), str)
+        for part in split_math(card[key]) if is_math(part)
+    })
+    math, pngs = {}, []
+    for fontsize in MATH_SIZES:
+        for fragment, img in zip(fragments, render_math_batch(fragments, MATH_WIDTH, fontsize, MATH_DPI)):
+            if img is None:
+                math[_math_key(fragment, fontsize)] = None   # known unrenderable, shown as source
+                continue
+            buf = BytesIO()
+            img.save(buf, format="PNG")
+            name = f"math/{len(pngs)}.png"
+            math[_math_key(fragment, fontsize)] = name
+            pngs.append((name, buf.getvalue()))
+
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "version": BUNDLE_VERSION,
+        "folder": folder,
+        "built": time.time(),
+        "instances": n,
+        "seed": seed,
+        "math_render": {"max_width": MATH_WIDTH, "dpi": MATH_DPI},
+        "topics": {topic: {name: len(inst) for name, inst in gens.items()} for topic, gens in cards.items()},
+        "math": math,
+    }
+    buf = BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("manifest.json", json.dumps(manifest, separators=(",", ":")))
+        zf.writestr("cards.json", json.dumps(cards, separators=(",", ":")))
+        for name, data in pngs:
+            zf.writestr(name, data, compress_type=zipfile.ZIP_STORED)   # PNGs are compressed already
+    atomic_write(path, buf.getvalue())
+    return manifest
+
+
+# -------------------------------------------------------
+# Drilling
+# -------------------------------------------------------
+
+class Bundle:
+    """
+    A deck bundle opened for drilling; install it with card_utils.use_bundle.
+    Cards are handed out as copies, formulas are decoded on first use.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._zip = zipfile.ZipFile(path)
+        self._zip_lock = threading.Lock()   # server threads share the file
+        self.manifest = json.loads(self._zip.read("manifest.json"))
+        if self.manifest.get("format") != BUNDLE_FORMAT or self.manifest.get("version") != BUNDLE_VERSION:
+            raise ValueError(f"{path} is not a deck bundle (or a newer version of one).")
+        self.folder = self.manifest["folder"]
+        self.cards = json.loads(self._zip.read("cards.json"))
+
+    def close(self):
+        self._zip.close()
+
+    def folders(self):
+        return [self.folder]
+
+    def topics(self, folder):
+        return sorted(self.cards) if folder == self.folder else []
+
+    def generator_names(self, full_topic_path):
+        return list(self._generators(full_topic_path))
+
+    def _generators(self, full_topic_path):
+        folder, _, topic = full_topic_path.partition(".")
+        if folder != self.folder or topic not in self.cards:
+            raise KeyError(f"{full_topic_path} is not in the bundle")
+        return self.cards[topic]
+
+    def submit(self, full_topic_path, func_name, seed=None):
+        """
+        A done Future of a card of the generator: the instance built with
+        `seed` if there is one (resumed sessions), else a random instance.
+        """
+        fut = Future()
+        try:
+            instances = self._generators(full_topic_path)[func_name]
+        except KeyError:
+            fut.set_exception(KeyError(f"{full_topic_path}.{func_name} is not in the bundle"))
+            return fut
+        card = next((c for c in instances if seed is not None and c["_seed"] == seed), None)
+        fut.set_result(dict(card or random.choice(instances)))
+        return fut
+
+    def math_image(self, fragment, max_width, fontsize, dpi, default=None):
+        """The pre-rendered formula (None if it does not render), `default` if not in the bundle."""
+        render = self.manifest["math_render"]
+        if (max_width, dpi) != (render["max_width"], render["dpi"]):
+            return default
+        key = _math_key(fragment, fontsize)
+        if key not in self.manifest["math"]:
+            return default
+        name = self.manifest["math"][key]
+        if name is None:
+            return None
+        with self._zip_lock:
+            data = self._zip.read(name)
+        img = Image.open(BytesIO(data))
+        img.load()
+        return img
+
+
+def open_bundle(path):
+    return Bundle(path)
+
+
+# -------------------------------------------------------
+# CLI
+# -------------------------------------------------------
+
+def cmd_build(args):
+    pool = None
+    if args.processes:
+        from worker_pool import WorkerPool
+        pool = WorkerPool(args.processes)
+        use_worker_pool(pool)
+    t0 = time.perf_counter()
+    try:
+        manifest = build_bundle(args.folder, args.output, args.instances, args.seed)
+    finally:
+        if pool is not None:
+            use_worker_pool(None)
+            pool.close()
+    n_gens = sum(len(g) for g in manifest["topics"].values())
+    n_cards = sum(sum(g.values()) for g in manifest["topics"].values())
+    n_math = sum(v is not None for v in manifest["math"].values())
+    print(f"Built {args.output or get_bundle_file(args.folder)}: {len(manifest['topics'])} topics, "
+          f"{n_gens} generators, {n_cards} cards, {n_math} formulas "
+          f"(seed {manifest['seed']}, {time.perf_counter() - t0:.1f}s)")
+
+
+def cmd_info(args):
+    bundle = open_bundle(args.bundle)
+    m = bundle.manifest
+    print(f"{args.bundle}: folder {m['folder']}, built {time.strftime('%Y-%m-%d %H:%M', time.localtime(m['built']))}, "
+          f"up to {m['instances']} instances per generator (seed {m['seed']})")
+    for topic, gens in sorted(m["topics"].items()):
+        print(f"  {topic}: " + ", ".join(f"{name} ({n})" for name, n in sorted(gens.items())))
+    bundle.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile a folder into a deck bundle.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("build", help="pre-generate cards and render their formulas into one file")
+    p.add_argument("folder")
+    p.add_argument("-n", "--instances", type=int, default=INSTANCES, help="instances per generator")
+    p.add_argument("-o", "--output", help="bundle file (default: deck_<folder>.zip)")
+    p.add_argument("--seed", type=int, help="seed the instances are drawn from (default: random)")
+    p.add_argument("--processes", type=int, default=0, help="generate in this many worker processes")
+    p.set_defaults(func=cmd_build)
+
+    p = sub.add_parser("info", help="list the topics and generators of a bundle")
+    p.add_argument("bundle")
+    p.set_defaults(func=cmd_info)
+
+    args = parser.parse_args()
+    args.func(args)
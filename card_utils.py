@@ -0,0 +1,419 @@
+import asyncio, importlib, inspect, os, random, re, time, threading
+from concurrent.futures import Future
+from functools import lru_cache
+from io import BytesIO
+import numpy as np
+from matplotlib.font_manager import FontProperties
+from matplotlib.mathtext import MathTextParser
+from PIL import Image
+
+# -----------------------------------------------
+# Card loading, grading and math rendering
+# (shared by the Tk app and the practice server)
+# -----------------------------------------------
+
+LEARN_DIR = "learn"
+
+REQUIRED_KEYS = ("name", "question", "data_type", "answer", "comparison")
+
+ASYNC_TIMEOUT = 30.0   # seconds an `async def` generator may take
+
+ARRAY_TYPES = ("vector", "matrix")
+MAX_REPORTED = 5       # wrong elements named in the feedback
+GRADE_CHUNK = 32768    # elements checked per pass, small enough to stay in cache
+
+# one parser for all formulas (it caches layouts); matplotlib is not thread
+# safe, hold render_lock while drawing with it from any thread
+_math_parser = MathTextParser("agg")
+render_lock = threading.Lock()
+
+
+# optional deck bundle (bundle_utils.Bundle) that cards come from instead of learn/
+_bundle = None
+
+def use_bundle(bundle):
+    """
+    Drill from `bundle` from now on: folders, topics and cards come from
+    it and its formulas are pre-rendered, no generator code runs. None
+    goes back to learn/.
+    """
+    global _bundle
+    _bundle = bundle
+
+def list_folders():
+    if _bundle is not None:
+        return _bundle.folders()
+    return sorted(
+        f for f in os.listdir(LEARN_DIR)
+        if os.path.isdir(os.path.join(LEARN_DIR, f))
+        and not f.startswith("__")
+    )
+
+def list_topics(folder):
+    if _bundle is not None:
+        return _bundle.topics(folder)
+    folder_path = os.path.join(LEARN_DIR, folder)
+    return sorted([
+        f[:-3] for f in os.listdir(folder_path)
+        if f.endswith(".py")
+    ])
+
+def import_topic(full_topic_path):
+    return importlib.import_module(f"{LEARN_DIR}.{full_topic_path}".replace("/", "."))
+
+def deterministic(func):
+    """
+    Mark a card generator as returning the same card on every call, so it
+    only runs once. Setting `func.deterministic = True` does the same.
+    """
+    func.deterministic = True
+    return func
+
+# (module, function) -> (module version, cached card or None if not deterministic)
+_card_cache = {}
+
+def _module_version(mod):
+    try:
+        st = os.stat(mod.__file__)
+    except (OSError, TypeError):
+        return None
+    return st.st_mtime_ns, st.st_size
+
+def call_generator(mod, name, func):
+    """
+    Run a card generator. Generators declared deterministic run once per
+    version of their module; later calls get a copy of that card. Nothing
+    is guessed: randomness from SystemRandom, secrets, the clock or files
+    cannot be told apart from a constant by looking at a few calls.
+    """
+    key = (mod.__name__, name)
+    version = _module_version(mod)
+    cached = _card_cache.get(key)
+    if cached is not None and cached[0] == version:
+        return dict(cached[1]) if cached[1] is not None else func()
+
+    data = func()
+    if getattr(func, "deterministic", False) and isinstance(data, dict):
+        _card_cache[key] = (version, data)
+        return dict(data)
+    _card_cache[key] = (version, None)
+    return data
+
+class AsyncRunner:
+    """An asyncio loop in a daemon thread, running `async def` card generators."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="AsyncGenerators", daemon=True)
+        self.thread.start()
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+_runner = None
+_runner_lock = threading.Lock()
+
+def get_async_runner():
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = AsyncRunner()
+    return _runner
+
+def new_seed():
+    return (time.time_ns() ^ os.getpid()) & 0xFFFFFFFF
+
+def seed_generators(seed):
+    """Seed the random streams card generators draw from."""
+    random.seed(seed)
+    np.random.seed(seed)
+
+def _tag_card(data, full_topic_path, name, seed=None):
+    """
+    Attach topic, generator and seed to a card; None if it lacks required
+    keys. Generator and seed are enough to build the same card again.
+    """
+    if not isinstance(data, dict) or not all(k in data for k in REQUIRED_KEYS):
+        return None
+    data["topic"] = full_topic_path
+    data["_func_name"] = name
+    data["_seed"] = seed
+    return data
+
+async def _run_async(func, full_topic_path, name):
+    try:
+        data = await asyncio.wait_for(func(), ASYNC_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"no card after {ASYNC_TIMEOUT:g}s")
+    return _tag_card(data, full_topic_path, name)
+
+# optional process pool running the generators (worker_pool.WorkerPool)
+_backend = None
+
+def use_worker_pool(pool):
+    """Run generators in `pool` from now on; None runs them in this process again."""
+    global _backend
+    _backend = pool
+
+def submit_card(full_topic_path, func_name, mod=None, seed=None):
+    """
+    Start generating one card. Returns a concurrent.futures.Future of the
+    card (None for an incomplete card). Plain generators are run right
+    away, `async def` ones concurrently on the shared asyncio loop; with a
+    worker pool in use, all of them run there in parallel.
+
+    Plain generators are seeded with `seed` (a fresh one if None), so the
+    same seed gives the same card. Async generators share the loop and its
+    random streams and cannot be rebuilt that way; their seed is None.
+    """
+    if _bundle is not None:
+        return _bundle.submit(full_topic_path, func_name, seed)
+    if _backend is not None:
+        return _backend.submit(full_topic_path, func_name, seed)
+    mod = mod or import_topic(full_topic_path)
+    func = getattr(mod, func_name)
+    if inspect.iscoroutinefunction(func):
+        return get_async_runner().submit(_run_async(func, full_topic_path, func_name))
+
+    fut = Future()
+    try:
+        seed = new_seed() if seed is None else seed
+        seed_generators(seed)
+        fut.set_result(_tag_card(call_generator(mod, func_name, func), full_topic_path, func_name, seed))
+    except Exception as e:
+        fut.set_exception(e)
+    return fut
+
+def generator_names(mod):
+    """Names of the functions a topic module defines; each is treated as a generator."""
+    return [
+        name for name in dir(mod)
+        if callable(getattr(mod, name)) and getattr(mod, name).__module__ == mod.__name__
+    ]
+
+def start_load_cards(full_topic_path):
+    """Start all generators of a topic; returns [(function name, future)]."""
+    if _bundle is not None:
+        return [(name, _bundle.submit(full_topic_path, name)) for name in _bundle.generator_names(full_topic_path)]
+    mod = import_topic(full_topic_path)
+    return [(name, submit_card(full_topic_path, name, mod)) for name in generator_names(mod)]
+
+def load_cards(full_topic_path):
+    cards = []
+    for name, fut in start_load_cards(full_topic_path):
+        try:
+            data = fut.result()
+            if data is not None:
+                cards.append(data)
+        except Exception as e:
+            print("Error in card", name, e)
+    return cards
+
+def generate_card(full_topic_path, func_name):
+    """Run a single generator again (used for repeats)."""
+    data = submit_card(full_topic_path, func_name).result(ASYNC_TIMEOUT + 5)
+    if data is None:
+        raise ValueError(f"{func_name} returned an incomplete card")
+    return data
+
+def parse_tolerance(comparison):
+    """(tol, rtol) from "exact", "tol=<x>", "rtol=<x>" or "tol=<x>, rtol=<y>"."""
+    tol = rtol = 0.0
+    for part in str(comparison).replace(";", ",").split(","):
+        key, _, value = part.strip().partition("=")
+        if key == "tol":
+            tol = float(value)
+        elif key == "rtol":
+            rtol = float(value)
+        elif key != "exact":
+            raise ValueError(f"Unknown comparison {part.strip()!r}")
+    return tol, rtol
+
+_ROW_SEP = re.compile(r"\]\s*,?\s*\[|;|\n")
+_BRACKETS = str.maketrans("[],;", "    ")
+
+def parse_array(text, data_type="matrix"):
+    """
+    Read numbers typed by the user into a float array. Vectors: "1, 2, 3"
+    or "[1 2 3]". Matrices: rows separated by ";", newlines or "], [",
+    e.g. "1 2; 3 4" or "[[1, 2], [3, 4]]". Raises ValueError.
+    """
+    text = str(text).strip()
+    if data_type == "vector":
+        return np.array(text.translate(_BRACKETS).split(), dtype=float)
+    rows = [r.translate(_BRACKETS).split() for r in _ROW_SEP.split(text.strip("[]"))]
+    rows = [r for r in rows if r]
+    if len({len(r) for r in rows}) > 1:
+        raise ValueError("Rows have different lengths.")
+    return np.array(rows, dtype=float).reshape(len(rows), -1)
+
+def _expected_array(card):
+    """The answer as an array and the allowed deviation, cached on the card."""
+    cached = card.get("_expected")
+    if cached is None or cached[0] is not card["answer"] or cached[1] != card["comparison"]:
+        expected = np.asarray(card["answer"], dtype=float)
+        if card["data_type"] == "vector":
+            expected = expected.ravel()
+        tol, rtol = parse_tolerance(card["comparison"])
+        bound = tol + rtol * np.abs(expected) if rtol else tol
+        cached = card["_expected"] = (card["answer"], card["comparison"], expected, bound)
+    return cached[2], cached[3]
+
+def _position(index, shape):
+    if len(shape) == 1:
+        return f"element {index[0] + 1}"
+    return f"row {index[0] + 1}, column {index[1] + 1}"
+
+def _off_elements(got, expected, bound):
+    """
+    Flat indices where |got - expected| > bound, checked in cache-sized
+    chunks through one buffer; only failing chunks build an index mask.
+    """
+    g, e = got.ravel(), expected.ravel()
+    b = None if np.isscalar(bound) else bound.ravel()
+    buf = np.empty(min(GRADE_CHUNK, g.size))
+    off = []
+    for i in range(0, g.size, GRADE_CHUNK):
+        j = i + GRADE_CHUNK
+        v = buf[:min(GRADE_CHUNK, g.size - i)]
+        np.subtract(g[i:j], e[i:j], out=v)
+        np.abs(v, out=v)
+        limit = bound
+        if b is not None:
+            v -= b[i:j]
+            limit = 0.0
+        if not v.max() <= limit:   # NaN fails here too
+            off.append(np.flatnonzero(~(v <= limit)) + i)
+    return np.concatenate(off) if off else ()
+
+def compare_arrays(got, expected, bound):
+    """
+    Elementwise check |got - expected| <= bound (a number or an array
+    like expected). Returns (ok, detail) with detail naming wrong elements.
+    """
+    if got.shape != expected.shape:
+        return False, f"Shape {'x'.join(map(str, got.shape))}, expected {'x'.join(map(str, expected.shape))}."
+    off = _off_elements(got, expected, bound)
+    if not len(off):
+        return True, ""
+
+    parts = [
+        f"{_position(idx, got.shape)}: {got[idx]:g} instead of {expected[idx]:g}"
+        for idx in (np.unravel_index(i, got.shape) for i in off[:MAX_REPORTED])
+    ]
+    more = f" (+{len(off) - MAX_REPORTED} more)" if len(off) > MAX_REPORTED else ""
+    return False, f"{len(off)} of {got.size} elements off: " + "; ".join(parts) + more
+
+def compare_detail(user, card):
+    """
+    compare() plus a short explanation for the feedback; only vector and
+    matrix answers are explained (which elements are off), others get "".
+    """
+    if card["data_type"] not in ARRAY_TYPES:
+        return compare(user, card), ""
+    try:
+        got = parse_array(user, card["data_type"])
+    except ValueError:
+        return False, "Could not read the answer as numbers."
+    try:
+        expected, bound = _expected_array(card)
+    except (ValueError, TypeError) as e:
+        return False, f"The card cannot be graded: {e}"
+    return compare_arrays(got, expected, bound)
+
+def format_answer(card, threshold=64):
+    """The correct answer for display (large arrays are abbreviated)."""
+    if card["data_type"] in ARRAY_TYPES:
+        return np.array2string(np.asarray(card["answer"]), threshold=threshold, separator=", ")
+    return str(card["answer"])
+
+def compare(user, card):
+    try:
+        if card["data_type"] in ARRAY_TYPES:
+            return compare_detail(user, card)[0]
+        if card["data_type"] == "float":
+            val = float(user)
+            tol = float(card["comparison"].split("=")[1])
+            return abs(val - card["answer"]) <= tol
+        elif card["data_type"] == "int":
+            return int(user) == int(card["answer"])
+        else:
+            norm = lambda s: re.sub(r"\s+", "", str(s).strip().lower())
+            return norm(user) == norm(card["answer"])
+    except Exception:
+        return False
+
+def split_math(text):
+    """Split text into prose and `$...$` fragments."""
+    return [p for p in re.split(r"(\$.*?\$)", text) if p]
+
+def is_math(part):
+    return part.startswith("$") and part.endswith("$")
+
+def _rasterize(latex_str, max_width, fontsize, dpi):
+    parsed = _math_parser.parse(f"${latex_str.strip('$')}$", dpi=dpi, prop=FontProperties(size=fontsize))
+    mask = Image.fromarray(np.asarray(parsed.image), "L")
+    img = Image.new("RGBA", mask.size, (0, 0, 0, 0))
+    img.putalpha(mask)
+    bbox = mask.getbbox()
+    if bbox:
+        img = img.crop(bbox)
+    if img.width > max_width:
+        scale = max_width / img.width
+        img = img.resize((max_width, int(img.height * scale)), Image.LANCZOS)
+    return img
+
+_MISSING = object()
+
+def render_math_batch(fragments, max_width=500, fontsize=16, dpi=150):
+    """
+    Render LaTeX fragments to cropped RGBA PIL images in one pass through
+    a shared mathtext parser, without setting up a figure per fragment.
+    Fragments matplotlib cannot render come back as None. Formulas
+    pre-rendered in the bundle in use are taken from there.
+    """
+    images = [_MISSING] * len(fragments)
+    if _bundle is not None:
+        for i, fragment in enumerate(fragments):
+            images[i] = _bundle.math_image(fragment, max_width, fontsize, dpi, _MISSING)
+    todo = [i for i, img in enumerate(images) if img is _MISSING]
+    if not todo:
+        return images
+    with render_lock:
+        for i in todo:
+            try:
+                images[i] = _rasterize(fragments[i], max_width, fontsize, dpi)
+            except Exception as e:
+                print("Latex render:", e)
+                images[i] = None
+    return images
+
+@lru_cache(maxsize=1024)
+def render_latex(latex_str, max_width=500, fontsize=16):
+    """Render a single LaTeX fragment (cached), None if it cannot be rendered."""
+    return render_math_batch([latex_str], max_width, fontsize)[0]
+
+@lru_cache(maxsize=256)
+def compose_text(text, max_width=500, fontsize=16):
+    """
+    Lay out question/hint text as one unit: a tuple of ("text", str) and
+    ("math", image or None, source) segments, with all formulas rendered
+    in one pass. Cached per text.
+    """
+    parts = split_math(text)
+    math = [p for p in parts if is_math(p)]
+    images = iter(render_math_batch(math, max_width, fontsize))
+    return tuple(
+        ("math", next(images), part) if is_math(part) else ("text", part)
+        for part in parts
+    )
+
+@lru_cache(maxsize=1024)
+def render_latex_png(latex_str, max_width=500, fontsize=16):
+    """Same as render_latex, encoded as PNG bytes (cached)."""
+    img = render_latex(latex_str, max_width, fontsize)
+    if img is None:
+        return None
+    buf = BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
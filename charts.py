@@ -0,0 +1,140 @@
+import datetime
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.dates import AutoDateLocator, ConciseDateFormatter
+from matplotlib.figure import Figure
+from PIL import Image
+
+from stats_utils import get_accuracy
+
+# -----------------------------------------------
+# Progress charts for the stats windows
+#
+# Charts are drawn off the UI thread and cached per scope (a folder or
+# one topic) together with the DB's seq, which grows with every attempt,
+# so they are only redrawn after new attempts.
+# -----------------------------------------------
+
+WEAKEST_SHOWN = 10
+CHART_SIZE = (660, 640)   # pixels
+CHART_DPI = 100
+
+
+def chart_data(db, prefix=""):
+    """
+    Collect what the charts show for the generators whose key starts with
+    `prefix` ("folder." for the whole folder, "folder.topic." for one topic).
+
+    Returns {"days": [(date, correct, wrong)], "weakest": [(name, accuracy, attempts)]}.
+    """
+    per_day = defaultdict(lambda: [0, 0])
+    weakest = []
+    for key, rec in db["generators"].items():
+        if not key.startswith(prefix):
+            continue
+        for days in rec.get("days", {}).values():
+            for day, (c, w) in days.items():
+                per_day[day][0] += c
+                per_day[day][1] += w
+        attempts = rec.get("correct", 0) + rec.get("wrong", 0)
+        if attempts:
+            weakest.append((key[len(prefix):], get_accuracy(rec), attempts))
+
+    weakest.sort(key=lambda e: (e[1], -e[2]))
+    return {
+        "days": [(datetime.date.fromisoformat(d), c, w) for d, (c, w) in sorted(per_day.items())],
+        "weakest": weakest[:WEAKEST_SHOWN],
+    }
+
+
+def render_charts(data, size=CHART_SIZE, dpi=CHART_DPI):
+    """Draw accuracy over time, attempts per day and weakest generators to a PIL image."""
+    fig = Figure(figsize=(size[0] / dpi, size[1] / dpi), dpi=dpi)
+    FigureCanvasAgg(fig)
+    acc_ax, day_ax, weak_ax = fig.subplots(3, 1, gridspec_kw={"height_ratios": [1, 1, 1.3]})
+
+    days = data["days"]
+    if days:
+        dates = [d for d, _, _ in days]
+        correct = [c for _, c, _ in days]
+        wrong = [w for _, _, w in days]
+        daily = [100 * c / (c + w) if c + w else 0 for _, c, w in days]
+        total_c = total = 0
+        overall = []
+        for c, w in zip(correct, wrong):
+            total_c += c
+            total += c + w
+            overall.append(100 * total_c / total if total else 0)
+
+        acc_ax.plot(dates, daily, "o-", ms=3, lw=1, label="that day")
+        acc_ax.plot(dates, overall, lw=2, label="overall")
+        acc_ax.set_ylim(0, 105)
+        acc_ax.legend(loc="lower left", fontsize=8)
+
+        day_ax.bar(dates, correct, color="tab:green", label="correct")
+        day_ax.bar(dates, wrong, bottom=correct, color="tab:red", label="wrong")
+        day_ax.legend(loc="upper left", fontsize=8)
+        for ax in (acc_ax, day_ax):
+            locator = AutoDateLocator(maxticks=8)
+            ax.xaxis.set_major_locator(locator)
+            ax.xaxis.set_major_formatter(ConciseDateFormatter(locator))
+            ax.tick_params(axis="x", labelsize=8)
+    else:
+        for ax in (acc_ax, day_ax):
+            ax.text(0.5, 0.5, "No dated attempts yet", ha="center", va="center", transform=ax.transAxes)
+    acc_ax.set_title("Accuracy over time (%)", fontsize=10)
+    day_ax.set_title("Attempts per day", fontsize=10)
+
+    weakest = data["weakest"]
+    if weakest:
+        rows = weakest[::-1]   # weakest at the top
+        bars = weak_ax.barh(range(len(rows)), [a * 100 for _, a, _ in rows], color="tab:orange")
+        weak_ax.set_yticks(range(len(rows)), [name[-40:] for name, _, _ in rows], fontsize=8)
+        weak_ax.bar_label(bars, [f"{a * 100:.0f}% of {n}" for _, a, n in rows], fontsize=7, padding=2)
+        weak_ax.set_xlim(0, 115)
+    else:
+        weak_ax.text(0.5, 0.5, "No attempts yet", ha="center", va="center", transform=weak_ax.transAxes)
+    weak_ax.set_title("Weakest generators (accuracy)", fontsize=10)
+
+    fig.tight_layout()
+    fig.canvas.draw()
+    return Image.frombuffer("RGBA", fig.canvas.get_width_height(), bytes(fig.canvas.buffer_rgba()))
+
+
+class ChartCache:
+    """
+    Renders charts in one background thread and keeps the latest image per
+    scope. `lock` guards the DB (the ProgressWriter's lock); it is held
+    only while the chart data is collected, not while drawing.
+    """
+
+    def __init__(self, lock):
+        self.lock = lock
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="charts")
+        self.cache = {}   # (folder, prefix) -> (seq, future of a PIL image)
+
+    def request(self, db, folder, prefix=None):
+        """Future of the chart image, reused while no attempts were added."""
+        prefix = prefix or f"{folder}."
+        key = (folder, prefix)
+        seq = db["seq"]
+        hit = self.cache.get(key)
+        if hit is not None and hit[0] == seq:
+            fut = hit[1]
+            if not fut.done() or (not fut.cancelled() and fut.exception() is None):
+                return fut
+        fut = self.pool.submit(self._render, db, prefix)
+        self.cache[key] = (seq, fut)
+        return fut
+
+    def _render(self, db, prefix):
+        with self.lock:
+            data = chart_data(db, prefix)
+        # no render_lock: the figure has its own canvas, matplotlib caches fonts
+        # per thread, and this pool's single thread draws one chart at a time
+        return render_charts(data)
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -59,6 +59,8 @@ def gcd_equivalence():
         "hint": "GCD is symmetric and stable under subtraction."
     }
 
+gcd_equivalence.deterministic = True   # same card every call: run once, reuse it
+
 
 # --- 5. Conceptual / definitional question (no hint) ---
 def definition_even():
@@ -71,6 +73,8 @@ def definition_even():
         "comparison": "exact"
     }
 
+definition_even.deterministic = True
+
 
 # --- 6. Float computation (tolerance) with repetition and hint ---
 def pythagoras_length():
@@ -85,3 +89,5 @@ def pythagoras_length():
         "repeat": 3,
         "hint": "Apply Pythagoras’ theorem."
     }
+
+pythagoras_length.deterministic = True
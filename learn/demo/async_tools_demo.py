@@ -0,0 +1,37 @@
+import asyncio
+import random
+import sys
+
+WORDS = ["periscope", "torpedo", "harbor", "sonar", "ballast", "hatch", "rudder", "anchor"]
+
+TOOL = "import hashlib, sys; print(hashlib.sha256(sys.argv[1].encode()).hexdigest()[:8])"
+
+
+async def _run_tool(word):
+    """Run an external process without blocking the app while it works."""
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, "-c", TOOL, word,
+        stdout=asyncio.subprocess.PIPE,
+    )
+    out, _ = await proc.communicate()
+    return out.decode().strip()
+
+
+# --- async generator: the answer comes from an external process ---
+async def external_checksum():
+    """Cards can be `async def` and wait on tools or local servers."""
+    word = random.choice(WORDS)
+    digest = await _run_tool(word)
+    return {
+        "name": f"sha256_{word}",
+        "question": (
+            f"Use a tool of your choice (sha256sum, Python, ...) to hash the word\n\n"
+            f"{word}\n\n"
+            f"with SHA-256. Enter the first 8 hex digits."
+        ),
+        "data_type": "string",
+        "answer": digest,
+        "comparison": "exact",
+        "repeat": 2,
+        "hint": "printf %s word | sha256sum"
+    }
@@ -0,0 +1,39 @@
+import numpy as np
+
+
+# --- vector answer: enter e.g. "3, -1" or "[3 -1]" ---
+def matrix_vector_product():
+    A = np.random.randint(-3, 4, (2, 2))
+    x = np.random.randint(-3, 4, 2)
+    return {
+        "name": f"matvec_{'_'.join(map(str, A.ravel()))}_{'_'.join(map(str, x))}",
+        "question": (
+            f"Compute $A x$ for A with rows [{A[0, 0]}, {A[0, 1]}] and [{A[1, 0]}, {A[1, 1]}]"
+            f" and $x = ({x[0]}, {x[1]})^T$.\n\n"
+            f"Enter the vector, e.g. 1, 2"
+        ),
+        "data_type": "vector",
+        "answer": A @ x,
+        "comparison": "exact",
+        "hint": "Row times column: each entry is one row of A dotted with x."
+    }
+
+
+# --- matrix answer: rows separated by ";" ---
+def inverse_2x2():
+    while True:
+        A = np.random.randint(-4, 5, (2, 2))
+        if round(np.linalg.det(A)) != 0:
+            break
+    a, b, c, d = A.ravel()
+    return {
+        "name": f"inverse_{a}_{b}_{c}_{d}",
+        "question": (
+            f"Invert the matrix (rows: [{a}, {b}] and [{c}, {d}]).\n\n"
+            f"Enter rows separated by ';', e.g. 0.5 0; 0 1 (3 significant digits are enough)"
+        ),
+        "data_type": "matrix",
+        "answer": np.linalg.inv(A),
+        "comparison": "tol=0.001, rtol=0.005",
+        "hint": "$A^{-1} = \\frac{1}{ad - bc} (d, -b; -c, a)$"
+    }
@@ -1,93 +1,83 @@
 import tkinter as tk
 from tkinter import messagebox, ttk
-import importlib, os, json, random, re
-from io import BytesIO
+import tkinter.font as tkfont
+import argparse, os, random
+from contextlib import nullcontext
 import matplotlib
 matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-from PIL import Image, ImageTk
-import time
+from PIL import ImageTk
 
-# NEW: import the folder-based stats module
-from stats_utils import load_progress, save_progress, update_card_result
+from card_utils import (
+    list_folders, list_topics, start_load_cards, submit_card,
+    compare_detail, format_answer, compose_text, use_worker_pool, use_bundle,
+)
 
-LEARN_DIR = "learn"
+# NEW: import the folder-based stats module
+from stats_utils import (
+    load_progress, update_card_result,
+    ProgressWriter, SAVE_EVERY_INTERVAL,
+    new_db, adopt_legacy_instances, weak_cards, weakest_cards, wrong_answers,
+    mastery, MasteryIndex, WEAK_THRESHOLD,
+)
+from charts import ChartCache
+from stats_index import LogIndex
+from session_utils import save_session, load_session, clear_session
+
+# how progress is written to disk: SAVE_EVERY_ANSWER, SAVE_EVERY_INTERVAL or SAVE_ON_EXIT
+SAVE_POLICY = SAVE_EVERY_INTERVAL
+SAVE_INTERVAL = 5.0  # seconds, used by SAVE_EVERY_INTERVAL
+
+POLL_MS = 50  # how often the UI checks on async card generators
+
+# > 0: run card generators in this many warm worker processes (worker_pool.py)
+GENERATOR_PROCESSES = 0
+
+# which cards of a topic a dive takes (mastery: recency-weighted accuracy)
+WEAKEST_N = 5
+MODES = {
+    "all": "All cards",
+    "weak": f"Mastery < {WEAK_THRESHOLD:.0%}",
+    "weakest": f"Weakest {WEAKEST_N}",
+}
 
 # -------------------------------------------------------
 # Helpers
 # -------------------------------------------------------
 
-def list_folders():
-    return sorted(
-        f for f in os.listdir(LEARN_DIR)
-        if os.path.isdir(os.path.join(LEARN_DIR, f))
-        and not f.startswith("__")
-    )
-
-def list_topics(folder):
-    folder_path = os.path.join(LEARN_DIR, folder)
-    return sorted([
-        f[:-3] for f in os.listdir(folder_path)
-        if f.endswith(".py")
-    ])
-
-def load_cards(full_topic_path):
-    mod = importlib.import_module(f"{LEARN_DIR}.{full_topic_path}".replace("/", "."))
-    cards = []
-    for name in dir(mod):
-        func = getattr(mod, name)
-        if callable(func) and func.__module__ == mod.__name__:
-            try:
-                random.seed(time.time_ns() ^ os.getpid())
-                data = func()
-                if all(k in data for k in ("name", "question", "data_type", "answer", "comparison")):
-                    data["topic"] = full_topic_path
-                    cards.append(data)
-            except Exception as e:
-                print("Error in card", name, e)
-    return cards
-
-def compare(user, card):
-    try:
-        if card["data_type"] == "float":
-            val = float(user)
-            tol = float(card["comparison"].split("=")[1])
-            return abs(val - card["answer"]) <= tol
-        elif card["data_type"] == "int":
-            return int(user) == int(card["answer"])
+def fill_composed_text(t, text, fontsize=16):
+    """
+    Show prose with inline math in a single Text widget. The layout comes
+    from compose_text, so a repeated question costs no rendering at all.
+    """
+    t.configure(state="normal")
+    t.delete("1.0", "end")
+    t.images = []   # Tk does not keep PhotoImages alive by itself
+    for seg in compose_text(text, fontsize=fontsize):
+        if seg[0] == "text":
+            t.insert("end", seg[1])
+        elif seg[1] is None:
+            t.insert("end", seg[2])   # unrenderable formula, show its source
         else:
-            norm = lambda s: re.sub(r"\s+", "", str(s).strip().lower())
-            return norm(user) == norm(card["answer"])
-    except Exception:
-        return False
-
-def render_latex_to_image(latex_str, max_width=500, fontsize=16):
-    try:
-        latex_str = latex_str.strip("$")
-        fig = plt.figure(figsize=(0.01, 0.01))
-        fig.patch.set_alpha(0)
-        plt.text(0.5, 0.5, f"${latex_str}$", fontsize=fontsize, ha="center", va="center")
-        plt.axis("off")
-        buf = BytesIO()
-        plt.savefig(buf, format="png", dpi=150, bbox_inches="tight", pad_inches=0.1, transparent=True)
-        plt.close(fig)
-        buf.seek(0)
-        img = Image.open(buf).convert("RGBA")
-        bbox = img.getbbox()
-        if bbox:
-            img = img.crop(bbox)
-        if img.width > max_width:
-            scale = max_width / img.width
-            img = img.resize((max_width, int(img.height * scale)), Image.LANCZOS)
-        return ImageTk.PhotoImage(img)
-    except Exception as e:
-        print("Latex render:", e)
-        return None
-
-def add_selectable_text(parent, text):
-    t = tk.Text(parent, wrap="word", width=80, height=min(20, text.count("\n")+4))
-    t.insert("1.0", text)
+            photo = ImageTk.PhotoImage(seg[1])
+            t.images.append(photo)
+            t.image_create("end", image=photo, align="center", padx=2)
     t.configure(state="disabled")
+    t.after_idle(lambda: fit_text_height(t))
+
+def fit_text_height(t, max_lines=20):
+    """Grow/shrink a Text widget to its content (images make lines taller)."""
+    if not t.winfo_exists():
+        return
+    pixels = t.count("1.0", "end", "update", "ypixels")
+    if isinstance(pixels, tuple):
+        pixels = pixels[0]
+    linespace = tkfont.Font(font=t.cget("font")).metrics("linespace")
+    lines = -(-(pixels or 0) // linespace)
+    t.configure(height=max(1, min(max_lines, lines)))
+
+def add_composed_text(parent, text):
+    t = tk.Text(parent, wrap="word", width=80, height=4)
+    fill_composed_text(t, text)
     t.pack(pady=8)
     return t
 
@@ -96,6 +86,28 @@ def truncate(s, n=80):
         return ""
     return s if len(s) <= n else s[:n] + " ..."
 
+def format_mastery(m):
+    """Mastery in percent for the log tables, "-" if never answered."""
+    return "-" if m is None else f"{m * 100:.1f}"
+
+def add_chart_tab(notebook, fut):
+    """A notebook tab showing the chart image once the background render is done."""
+    label = tk.Label(notebook, text="Drawing charts ...")
+    notebook.add(label, text="Charts")
+
+    def poll():
+        if not label.winfo_exists():
+            return
+        if not fut.done():
+            label.after(POLL_MS, poll)
+        elif fut.cancelled() or fut.exception() is not None:
+            label.configure(text="Charts could not be drawn.")
+        else:
+            label.image = ImageTk.PhotoImage(fut.result())
+            label.configure(image=label.image, text="")
+    poll()
+    return label
+
 def show_full_text_popup(parent, title, text):
     top = tk.Toplevel(parent)
     top.title(title)
@@ -104,23 +116,26 @@ def show_full_text_popup(parent, title, text):
     txt.configure(state="disabled")
     txt.pack(fill="both", expand=True)
 
-def get_accuracy(rec):
-    c = rec.get("correct", 0)
-    w = rec.get("wrong", 0)
-    return c / (c + w) if (c + w) else 0
-
 # -------------------------------------------------------
 # GUI
 # -------------------------------------------------------
 
 class LearnApp(tk.Tk):
-    def __init__(self):
+    def __init__(self, bundle=None):
         super().__init__()
         self.title("Jürgen ProcKnow - Deep Dive into Knowledge")
         self.geometry("800x600")
 
+        # drilling from a deck bundle (bundle_utils.py): no generator code runs
+        self.bundle = bundle
+        if bundle is not None:
+            use_bundle(bundle)
+            self.title(f"Jürgen ProcKnow - Deep Dive into Knowledge ({os.path.basename(bundle.path)})")
+
         self.current_folder = None
-        self.db = {}
+        self.current_topic = None
+        self.db = new_db()
+        self.mastery = MasteryIndex(self.db)
         self.all_cards = []
         self.due = []
         self.current = None
@@ -128,18 +143,36 @@ class LearnApp(tk.Tk):
         self.repeat_counter = 0
         self.repeat_target = 0
 
+        # async generators: cards still being generated / awaited repeat
+        self.load_id = 0
+        self.pending = []
+        self.waiting = None
+        self.starving = False
+
+        # progress is saved off the UI thread, flushed on close
+        self.writer = ProgressWriter(SAVE_POLICY, SAVE_INTERVAL)
+        # charts are drawn in the background and redrawn only after new attempts
+        self.charts = ChartCache(self.writer.lock)
+
+        self.workers = None
+        if GENERATOR_PROCESSES > 0 and bundle is None:
+            from worker_pool import WorkerPool
+            self.workers = WorkerPool(GENERATOR_PROCESSES)
+            use_worker_pool(self.workers)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
         # ---------------- top bar ----------------
         topbar = tk.Frame(self)
         topbar.pack(fill="x", pady=5)
 
-        # checkbox for weak-only mode
-        self.only_weak_var = tk.BooleanVar(value=False)
-        self.only_weak_chk = tk.Checkbutton(
-            topbar,
-            text="Only <75% accuracy",
-            variable=self.only_weak_var
+        # which cards to dive into: all, weak ones or the weakest few
+        self.mode_var = tk.StringVar(value=MODES["all"])
+        self.mode_menu = ttk.Combobox(
+            topbar, textvariable=self.mode_var,
+            values=list(MODES.values()),
+            state="readonly", width=16
         )
-        self.only_weak_chk.pack(side="left", padx=10)
+        self.mode_menu.pack(side="left", padx=10)
 
         self.folder_var = tk.StringVar()
         self.folder_menu = ttk.Combobox(
@@ -196,10 +229,11 @@ class LearnApp(tk.Tk):
         self.hint_btn = tk.Button(btn_frame, text="Periscope (hint)", command=self.show_hint)
         self.hint_btn.pack(side="left", padx=5)
 
-        self.hint_label = tk.Label(self, text="", font=("Arial", 10, "italic"),
-                                   fg="#555", wraplength=700,
-                                   justify="center", bg="#f8f8f8")
-        self.hint_label.pack(pady=5)
+        self.hint_text = tk.Text(self, wrap="word", width=80, height=1,
+                                 font=("Arial", 10, "italic"), fg="#555", bg="#f8f8f8",
+                                 relief="flat", highlightthickness=0, state="disabled")
+        self.hint_text.tag_configure("center", justify="center")
+        self.hint_text.pack(pady=5)
 
         self.feedback = tk.Label(self, text="", font=("Arial", 11))
         self.feedback.pack(pady=5)
@@ -225,6 +259,20 @@ class LearnApp(tk.Tk):
         self.status = tk.Label(self, text="", anchor="w")
         self.status.pack(fill="x", side="bottom")
 
+        self.after(200, self.offer_resume)
+
+    # ---------------------------------------------------
+    def on_close(self):
+        self.charts.close()
+        if self.workers is not None:
+            use_worker_pool(None)
+            self.workers.close()
+        if self.bundle is not None:
+            use_bundle(None)
+            self.bundle.close()
+        self.writer.close()
+        self.destroy()
+
     # ---------------------------------------------------
     def load_folder(self):
         folder = self.folder_var.get()
@@ -234,8 +282,12 @@ class LearnApp(tk.Tk):
 
         self.current_folder = folder
         self.db = load_progress(folder)
+        self.mastery = MasteryIndex(self.db, self.writer.lock)
+        self.charts.request(self.db, folder)   # ready by the time the log is opened
 
         topics = list_topics(folder)
+        if self.workers is not None:
+            self.workers.warm(f"{folder}.{t}" for t in topics)
         self.topic_menu.config(values=topics, state="readonly")
         self.topic_var.set("")
 
@@ -251,34 +303,214 @@ class LearnApp(tk.Tk):
             return
 
         full_topic = f"{self.current_folder}.{topic}"
-        self.all_cards = load_cards(full_topic)
-        self.due = self.all_cards[:]
+
+        # plain generators are done right away, async ones keep arriving
+        self.start_session(full_topic)
+        for name, fut in start_load_cards(full_topic):
+            if fut.done():
+                card = self.card_result(name, fut)
+                if card is not None:
+                    self.all_cards.append(card)
+            else:
+                self.pending.append((name, fut))
+
+        self.due = self.admit_cards(self.all_cards)
         random.shuffle(self.due)
 
-        # filter weak cards if checkbox is active
-        if self.only_weak_var.get():
-            filtered = []
-            prefix = f"{full_topic}."
-            for card in self.due:
-                key = prefix + card["name"]
-                rec = self.db.get(key, {})
-                if get_accuracy(rec) < 0.75:
-                    filtered.append(card)
-            self.due = filtered
-            random.shuffle(self.due)
-
-        if not self.due:
-            messagebox.showinfo("Info", "No cards in this topic.")
+        if not self.due and not self.pending:
+            if self.all_cards:
+                messagebox.showinfo("Info", "No weak cards in this topic (cards never answered do not count as weak).")
+            else:
+                messagebox.showinfo("Info", "No cards in this topic.")
             return
 
-        topic_entries = {
-            k: v for k, v in self.db.items()
-            if k.startswith(f"{full_topic}.")
-        }
+        # the writer merges other windows' answers into self.db meanwhile
+        with self.writer.lock:
+            topic_entries = {
+                k: v for k, v in self.db["generators"].items()
+                if k.startswith(f"{full_topic}.")
+            }
         if topic_entries:
-            TopicStatsWindow(self, full_topic, topic_entries)
+            charts = self.charts.request(self.db, self.current_folder, f"{full_topic}.")
+            TopicStatsWindow(self, full_topic, topic_entries, charts, self.writer.lock)
 
+        if self.pending:
+            self.after(POLL_MS, self.poll_pending, self.load_id)
         self.next_card()
+        self.snapshot_session()
+
+    def start_session(self, full_topic):
+        self.load_id += 1
+        self.current_topic = full_topic
+        self.current = None
+        self.pending = []
+        self.waiting = None
+        self.starving = False
+        self.repeat_target = 0
+        self.all_cards = []
+
+    # ---------------------------------------------------
+    def snapshot_session(self):
+        """Remember the queue (as generator refs) so the next start can resume it."""
+        if self.current is None and not self.due and not self.pending:
+            clear_session()
+            return
+        save_session(
+            self.current_topic, self.current, self.due,
+            pending=[name for name, _ in self.pending],
+            repeat_counter=self.repeat_counter,
+            repeat_target=self.repeat_target,
+            mode=self.mode(),
+        )
+
+    def offer_resume(self):
+        state = load_session()
+        if state is None:
+            return
+        folder, topic = state["folder"], state["topic"]
+        if folder not in list_folders() or topic not in list_topics(folder):
+            clear_session()
+            return
+        left = len(state["due"]) + (state["current"] is not None)
+        if not messagebox.askyesno("Resume", f"Resume your dive into '{folder}.{topic}' ({left} cards left)?"):
+            clear_session()
+            return
+        self.resume_session(state)
+
+    def resume_session(self, state):
+        """Rebuild the current card right away, the rest of the queue when due."""
+        self.folder_var.set(state["folder"])
+        self.load_folder()
+        self.topic_var.set(state["topic"])
+        # snapshots of older versions only know the weak filter
+        mode = state.get("mode") or ("weak" if state.get("only_weak") else "all")
+        self.mode_var.set(MODES.get(mode, MODES["all"]))
+
+        self.start_session(f"{state['folder']}.{state['topic']}")
+        self.due = [list(ref) for ref in state["due"]]
+        for name in state.get("pending", []):
+            try:
+                self.pending.append((name, submit_card(self.current_topic, name)))
+            except Exception as e:
+                print("Error in card", name, e)
+        if self.pending:
+            self.after(POLL_MS, self.poll_pending, self.load_id)
+
+        if state["current"] is None:
+            self.next_card()
+            return
+        self.current = list(state["current"])
+        self.repeat_counter = state.get("repeat_counter", 0)
+        self.repeat_target = state.get("repeat_target", 0)
+        if self.rebuild_current(fresh=False):
+            self.show_card()
+
+    def rebuild_current(self, fresh):
+        """
+        Replace the ref [generator, seed] in self.current by its card.
+        False if the card is still being generated or could not be built
+        (then the UI moves on by itself). `fresh` starts its repeat count.
+        """
+        name, seed = self.current
+        try:
+            fut = submit_card(self.current_topic, name, seed=seed)
+        except Exception as e:
+            print("Error in card", name, e)
+            fut = None
+        if fut is not None and not fut.done():
+            self.waiting = fut
+            self.hint_btn.config(state="disabled")
+            self.show_message("Generating card ...")
+            self.after(POLL_MS, self.poll_rebuild, fut, fresh)
+            return False
+        return self.take_rebuilt(fut, fresh)
+
+    def take_rebuilt(self, fut, fresh):
+        card = self.card_result(self.current[0], fut) if fut is not None else None
+        if card is None:
+            self.current = None
+            self.next_card()   # skip it
+            return False
+        self.current = card
+        if fresh:
+            self.repeat_target = card.get("repeat", 0)
+            self.repeat_counter = 1
+        return True
+
+    def poll_rebuild(self, fut, fresh):
+        if self.waiting is not fut:
+            return   # topic changed meanwhile
+        if not fut.done():
+            self.after(POLL_MS, self.poll_rebuild, fut, fresh)
+            return
+        self.waiting = None
+        for w in self.q_widgets:
+            w.destroy()
+        self.q_widgets.clear()
+        if self.take_rebuilt(fut, fresh):
+            self.show_card()
+
+    # ---------------------------------------------------
+    def card_result(self, name, fut):
+        try:
+            return fut.result()
+        except Exception as e:
+            print("Error in card", name, e)
+            return None
+
+    def admit_cards(self, cards):
+        """Cards that go into the queue (weak filter applied per generator)."""
+        self.writer.apply(self.current_folder, self.db, adopt_legacy_instances, cards)
+        mode = self.mode()
+        if mode == "weak":
+            return weak_cards(cards, self.db, index=self.mastery)
+        if mode == "weakest":
+            return weakest_cards(cards, self.db, WEAKEST_N, index=self.mastery)
+        return list(cards)
+
+    def mode(self):
+        """Key in MODES of the selected dive mode."""
+        label = self.mode_var.get()
+        return next((key for key, text in MODES.items() if text == label), "all")
+
+    def poll_pending(self, load_id):
+        """Pick up cards from async generators without blocking the UI."""
+        if load_id != self.load_id:
+            return   # a newer topic was loaded
+
+        arrived, still = [], []
+        for name, fut in self.pending:
+            if fut.done():
+                card = self.card_result(name, fut)
+                if card is not None:
+                    arrived.append(card)
+            else:
+                still.append((name, fut))
+        self.pending = still
+
+        if arrived:
+            self.all_cards += arrived
+            for card in self.admit_cards(arrived):
+                self.due.insert(random.randint(0, len(self.due)), card)
+            if not self.starving:
+                self.update_status()
+
+        if self.starving and (self.due or not self.pending):
+            self.starving = False
+            self.next_card()
+        if self.pending:
+            self.after(POLL_MS, self.poll_pending, load_id)
+
+    def update_status(self):
+        text = f"{len(self.due)} cards remaining"
+        if self.pending:
+            text += f" ({len(self.pending)} still generating)"
+        self.status.config(text=text)
+
+    def show_message(self, text):
+        lbl = tk.Label(self.q_frame, text=text, font=("Arial", 13))
+        lbl.pack(pady=10)
+        self.q_widgets.append(lbl)
 
     # ---------------------------------------------------
     def next_card(self):
@@ -286,7 +518,7 @@ class LearnApp(tk.Tk):
             w.destroy()
         self.q_widgets.clear()
 
-        self.hint_label.config(text="")
+        self.clear_hint()
         self.feedback.config(text="")
         self.peeked = False
 
@@ -300,107 +532,105 @@ class LearnApp(tk.Tk):
             func_name = self.current["_func_name"]
             topic = self.current["topic"]
             try:
-                mod = importlib.import_module(f"{LEARN_DIR}.{topic}")
-                func = getattr(mod, func_name)
-                new = func()
-                new["topic"] = topic
-                new["_func_name"] = func_name
-                self.current = new
+                fut = submit_card(topic, func_name)
             except Exception as e:
                 print("Repeat error:", e)
+                fut = None
+            if fut is not None and not fut.done():
+                # async generator: keep the UI alive until it delivers
+                self.waiting = fut
+                self.hint_btn.config(state="disabled")
+                self.show_message("Generating card ...")
+                self.after(POLL_MS, self.poll_repeat, fut)
+                return
+            if fut is not None:
+                self.take_repeat(fut)
         else:
             self.repeat_counter = 0
             self.repeat_target = 0
 
             if not self.due:
-                lbl = tk.Label(self.q_frame, text="All objectives complete. Returning to harbor!",
-                               font=("Arial", 13))
-                lbl.pack(pady=10)
-                self.q_widgets.append(lbl)
                 self.current = None
-                self.status.config(text="0 cards remaining.")
                 self.hint_btn.config(state="disabled")
+                if self.pending:
+                    self.starving = True
+                    self.show_message("Generating cards ...")
+                    self.update_status()
+                    return
+                self.show_message("All objectives complete. Returning to harbor!")
+                self.status.config(text="0 cards remaining.")
                 return
 
             self.current = self.due.pop()
+            if isinstance(self.current, list):
+                # resumed session: cards are rebuilt from generator and seed once due
+                if not self.rebuild_current(fresh=True):
+                    return
             self.repeat_target = self.current.get("repeat", 0)
             self.repeat_counter = 1
 
-            # find the function name
-            try:
-                topic = self.current["topic"]
-                mod = importlib.import_module(f"{LEARN_DIR}.{topic}")
-                for name in dir(mod):
-                    func = getattr(mod, name)
-                    if callable(func) and func.__module__.endswith(topic):
-                        try:
-                            t = func()
-                            if isinstance(t, dict) and t.get("name") == self.current["name"]:
-                                self.current["_func_name"] = name
-                                break
-                        except Exception:
-                            continue
-            except Exception:
-                self.current["_func_name"] = None
+        self.show_card()
+
+    def take_repeat(self, fut):
+        try:
+            card = fut.result()
+            if card is None:
+                raise ValueError("incomplete card")
+            self.current = card
+        except Exception as e:
+            print("Repeat error:", e)
+
+    def poll_repeat(self, fut):
+        if self.waiting is not fut:
+            return   # topic changed meanwhile
+        if not fut.done():
+            self.after(POLL_MS, self.poll_repeat, fut)
+            return
+        self.waiting = None
+        self.take_repeat(fut)
+        for w in self.q_widgets:
+            w.destroy()
+        self.q_widgets.clear()
+        self.show_card()
 
+    def show_card(self):
         qtext = self.current["question"]
         self.ans_entry.delete(0, tk.END)
-        self.status.config(text=f"{len(self.due)} cards remaining")
+        self.update_status()
 
         if "hint" in self.current:
             self.hint_btn.config(state="normal")
         else:
             self.hint_btn.config(state="disabled")
 
-        parts = re.split(r"(\$.*?\$)", qtext)
-        for part in parts:
-            if not part:
-                continue
-            if part.startswith("$") and part.endswith("$"):
-                img = render_latex_to_image(part)
-                if img:
-                    lbl = tk.Label(self.q_frame, image=img, bg="#f8f8f8")
-                    lbl.image = img
-                    lbl.pack(pady=8)
-                    self.q_widgets.append(lbl)
-            else:
-                widget = add_selectable_text(self.q_frame, part)
-                self.q_widgets.append(widget)
+        # whole question, prose and inline math, in one widget
+        widget = add_composed_text(self.q_frame, qtext)
+        self.q_widgets.append(widget)
 
     # ---------------------------------------------------
+    def clear_hint(self):
+        self.hint_text.configure(state="normal")
+        self.hint_text.delete("1.0", "end")
+        self.hint_text.configure(state="disabled", height=1)
+        self.hint_text.images = []
+
     def render_hint(self, text):
-        for w in self.hint_label.winfo_children():
-            w.destroy()
-        self.hint_label.config(text="")
-
-        parts = re.split(r"(\$.*?\$)", text)
-        for part in parts:
-            if not part:
-                continue
-            if part.startswith("$") and part.endswith("$"):
-                img = render_latex_to_image(part)
-                if img:
-                    lbl = tk.Label(self.hint_label, image=img, bg="#f8f8f8")
-                    lbl.image = img
-                    lbl.pack(side="left", padx=4)
-            else:
-                lbl = tk.Label(self.hint_label, text=part,
-                               font=("Arial", 10, "italic"), fg="#555", bg="#f8f8f8")
-                lbl.pack(side="left", padx=4)
+        fill_composed_text(self.hint_text, text, fontsize=13)
+        self.hint_text.tag_add("center", "1.0", "end")
 
     def show_hint(self):
-        if self.current and "hint" in self.current:
+        if self.current and not self.waiting and "hint" in self.current:
             self.render_hint(self.current["hint"])
             self.peeked = True
             self.hint_btn.config(state="disabled")
 
     # ---------------------------------------------------
     def submit(self):
-        if not self.current:
+        if not self.current or self.waiting:
             return
 
         user = self.ans_entry.get()
-        ok = compare(user, self.current)
+        ok, detail = compare_detail(user, self.current)
 
         # cache the proposed verdict
         self.proposed_ok = ok
@@ -410,7 +640,9 @@ class LearnApp(tk.Tk):
         verdict_text = "System verdict: CORRECT" if ok else "System verdict: WRONG"
         color = "green" if ok else "red"
 
-        msg = f"{verdict_text}\nYour answer: {user}\nCorrect: {self.current['answer']}"
+        msg = f"{verdict_text}\nYour answer: {user}\nCorrect: {format_answer(self.current)}"
+        if detail:
+            msg += f"\n{detail}"
         self.feedback.config(text=msg, fg=color)
 
         # Disable hint button
@@ -425,7 +657,8 @@ class LearnApp(tk.Tk):
         update_card_result(
             self.current, self.db,
             self.proposed_ok,
-            user_answer=self.user_answer_cache
+            user_answer=self.user_answer_cache,
+            writer=self.writer
         )
         self.after_user_verdict()
 
@@ -435,7 +668,8 @@ class LearnApp(tk.Tk):
         update_card_result(
             self.current, self.db,
             not self.proposed_ok,
-            user_answer=self.user_answer_cache
+            user_answer=self.user_answer_cache,
+            writer=self.writer
         )
         self.after_user_verdict()
 
@@ -451,13 +685,16 @@ class LearnApp(tk.Tk):
 
         # next card
         self.next_card()
+        self.snapshot_session()
 
     # ---------------------------------------------------
     def show_stats(self):
         if not self.current_folder:
             messagebox.showinfo("Info", "Load a folder first.")
             return
-        StatsWindow(self, self.db, self.current_folder)
+        charts = self.charts.request(self.db, self.current_folder)
+        StatsWindow(self, self.db["generators"], self.current_folder, charts, self.db["instances"],
+                    self.writer.lock)
 
 
 # -------------------------------------------------------
@@ -465,16 +702,33 @@ class LearnApp(tk.Tk):
 # -------------------------------------------------------
 
 class StatsWindow(tk.Toplevel):
-    def __init__(self, master, db, folder_name):
+    MAX_ROWS = 500   # rows shown at once; narrow down with search and filters
+
+    def __init__(self, master, db, folder_name, charts=None, instances=None, lock=None):
         super().__init__(master)
         self.title(f"Captain's Log – Folder: {folder_name}")
-        self.geometry("700x500")
+        self.geometry("760x760" if charts else "760x560")
         self.db = db
+        # guards the records against the progress writer (writer.lock)
+        self.lock = lock or nullcontext()
+        # searchable tables; indexes are built on first use
+        self.tables = {"generators": db}
+        if instances is not None:
+            self.tables["cards"] = instances
+        self.indexes = {}
+
+        # the table tab, plus a chart tab when a chart future is given
+        notebook = ttk.Notebook(self)
+        notebook.pack(fill="both", expand=True)
+        table_tab = tk.Frame(notebook)
+        notebook.add(table_tab, text="Log")
+        if charts is not None:
+            add_chart_tab(notebook, charts)
 
         self.sort_key = "accuracy"
         self.sort_reverse = True
 
-        header = tk.Frame(self)
+        header = tk.Frame(table_tab)
         header.pack(fill="x", pady=5)
 
         tk.Button(header, text="Sort by Name", command=lambda: self.sort_by("name")).pack(side="left", padx=5)
@@ -482,39 +736,109 @@ class StatsWindow(tk.Toplevel):
         tk.Button(header, text="Sort by Wrong", command=lambda: self.sort_by("wrong")).pack(side="left", padx=5)
         tk.Button(header, text="Sort by Accuracy", command=lambda: self.sort_by("accuracy")).pack(side="left", padx=5)
 
-        total = len(db)
-        c = sum(v.get("correct", 0) for v in db.values())
-        w = sum(v.get("wrong", 0) for v in db.values())
+        with self.lock:
+            total = len(db)
+            c = sum(v.get("correct", 0) for v in db.values())
+            w = sum(v.get("wrong", 0) for v in db.values())
         acc = (c / (c + w)) * 100 if (c + w) else 0
 
-        tk.Label(self, text=f"Total cards tracked: {total}", font=("Arial", 11)).pack(anchor="w", padx=10)
-        tk.Label(self, text=f"Accuracy: {acc:.1f}%", font=("Arial", 11, "bold")).pack(anchor="w", padx=10)
-
-        frame = tk.Frame(self)
+        tk.Label(table_tab, text=f"Total generators tracked: {total}", font=("Arial", 11)).pack(anchor="w", padx=10)
+        tk.Label(table_tab, text=f"Accuracy: {acc:.1f}%", font=("Arial", 11, "bold")).pack(anchor="w", padx=10)
+
+        # ---------------- search and filters ----------------
+        search_bar = tk.Frame(table_tab)
+        search_bar.pack(fill="x", padx=10, pady=(8, 0))
+        filter_bar = tk.Frame(table_tab)
+        filter_bar.pack(fill="x", padx=10, pady=(4, 0))
+
+        self.search_var = tk.StringVar()
+        self.prefix_var = tk.BooleanVar(value=False)
+        self.level_var = tk.StringVar(value="generators")
+        self.topic_var = tk.StringVar(value="All topics")
+        self.min_acc_var = tk.StringVar(value="0")
+        self.max_acc_var = tk.StringVar(value="100")
+        self.min_attempts_var = tk.StringVar(value="0")
+        self.wrongs_var = tk.BooleanVar(value=False)
+
+        tk.Label(search_bar, text="Search:").pack(side="left")
+        search = tk.Entry(search_bar, textvariable=self.search_var, width=30)
+        search.pack(side="left", padx=5)
+        tk.Checkbutton(search_bar, text="Prefix", variable=self.prefix_var).pack(side="left")
+        if len(self.tables) > 1:
+            ttk.Combobox(search_bar, textvariable=self.level_var, values=list(self.tables),
+                         state="readonly", width=11).pack(side="left", padx=5)
+        self.match_label = tk.Label(search_bar, text="", fg="#555")
+        self.match_label.pack(side="right")
+
+        self.topic_menu = ttk.Combobox(filter_bar, textvariable=self.topic_var, state="readonly", width=22)
+        self.topic_menu.pack(side="left")
+        tk.Label(filter_bar, text="Accuracy").pack(side="left", padx=(10, 2))
+        tk.Spinbox(filter_bar, from_=0, to=100, increment=5, width=4, textvariable=self.min_acc_var).pack(side="left")
+        tk.Label(filter_bar, text="–").pack(side="left")
+        tk.Spinbox(filter_bar, from_=0, to=100, increment=5, width=4, textvariable=self.max_acc_var).pack(side="left")
+        tk.Label(filter_bar, text="% Min. attempts").pack(side="left", padx=(4, 2))
+        tk.Spinbox(filter_bar, from_=0, to=10_000, width=5, textvariable=self.min_attempts_var).pack(side="left")
+        tk.Checkbutton(filter_bar, text="Has wrong answers", variable=self.wrongs_var).pack(side="left", padx=10)
+
+        frame = tk.Frame(table_tab)
         frame.pack(fill="both", expand=True, pady=10)
 
         self.tree = ttk.Treeview(
             frame,
-            columns=("name", "correct", "wrong", "accuracy", "wrongs"),
+            columns=("name", "correct", "wrong", "accuracy", "mastery", "wrongs"),
             show="headings"
         )
 
-        for col in ("name", "correct", "wrong", "accuracy", "wrongs"):
+        for col in ("name", "correct", "wrong", "accuracy", "mastery", "wrongs"):
             self.tree.heading(col, text=col.capitalize())
 
-        self.tree.column("name", width=220)
-        self.tree.column("correct", width=80, anchor="center")
-        self.tree.column("wrong", width=80, anchor="center")
-        self.tree.column("accuracy", width=100, anchor="center")
-        self.tree.column("wrongs", width=200)
+        self.tree.column("name", width=200)
+        self.tree.column("correct", width=70, anchor="center")
+        self.tree.column("wrong", width=70, anchor="center")
+        self.tree.column("accuracy", width=80, anchor="center")
+        self.tree.column("mastery", width=80, anchor="center")
+        self.tree.column("wrongs", width=160)
 
         self.tree.pack(fill="both", expand=True, padx=10, pady=5)
         self.tree.bind("<Double-1>", self.on_double_click)
 
-        self.refresh_table()
+        # rows are inserted once, on first display, and then only detached/moved
+        self.inserted = set()
+        self.shown = []
+        self.refresh_job = None
+        for var in (self.search_var, self.prefix_var, self.topic_var, self.min_acc_var,
+                    self.max_acc_var, self.min_attempts_var, self.wrongs_var):
+            var.trace_add("write", self.schedule_refresh)
+        self.level_var.trace_add("write", self.change_level)
+
+        self.change_level()
+        search.focus_set()
 
         tk.Button(self, text="Close", command=self.destroy).pack(pady=5)
 
+    @property
+    def index(self):
+        level = self.level_var.get()
+        if level not in self.indexes:
+            with self.lock:
+                self.indexes[level] = LogIndex(self.tables[level])
+        return self.indexes[level]
+
+    def change_level(self, *_):
+        """Switch between generators and single cards: a different index and row set."""
+        if self.inserted:
+            self.tree.delete(*self.inserted)
+        self.inserted.clear()
+        self.shown = []
+        self.topic_menu.config(values=["All topics"] + self.index.topics)
+        self.topic_var.set("All topics")
+        self.refresh_table()
+
+    def schedule_refresh(self, *_):
+        # one refresh per burst of changes (typing, spinbox repeat)
+        if self.refresh_job is None:
+            self.refresh_job = self.after_idle(self.refresh_table)
+
     def sort_by(self, key):
         if self.sort_key == key:
             self.sort_reverse = not self.sort_reverse
@@ -523,30 +847,43 @@ class StatsWindow(tk.Toplevel):
             self.sort_reverse = True
         self.refresh_table()
 
+    def filters(self):
+        def number(var, default):
+            try:
+                return float(var.get())
+            except ValueError:
+                return default
+        topic = self.topic_var.get()
+        return dict(
+            text=self.search_var.get().strip(),
+            prefix=self.prefix_var.get(),
+            topic=None if topic == "All topics" else topic,
+            min_accuracy=number(self.min_acc_var, 0),
+            max_accuracy=number(self.max_acc_var, 100),
+            min_attempts=number(self.min_attempts_var, 0),
+            has_wrongs=self.wrongs_var.get(),
+        )
+
     def refresh_table(self):
-        for i in self.tree.get_children():
-            self.tree.delete(i)
-
-        rows = []
-        for name, rec in self.db.items():
-            c = rec.get("correct", 0)
-            w = rec.get("wrong", 0)
-            acc = (c / (c + w)) * 100 if (c + w) else 0
-            full_wrong = ", ".join(rec.get("wrong_log", []))
-            rows.append({
-                "name": name,
-                "correct": c,
-                "wrong": w,
-                "accuracy": acc,
-                "wrongs": truncate(full_wrong)
-            })
-
-        rows.sort(key=lambda r: r[self.sort_key], reverse=self.sort_reverse)
-        for r in rows:
-            self.tree.insert(
-                "", "end",
-                values=(r["name"], r["correct"], r["wrong"], f"{r['accuracy']:.1f}", r["wrongs"])
-            )
+        self.refresh_job = None
+        index = self.index
+        ids, matches = index.query(sort=self.sort_key, reverse=self.sort_reverse,
+                                   limit=self.MAX_ROWS, **self.filters())
+
+        if self.shown:
+            self.tree.detach(*self.shown)
+        self.shown = [str(i) for i in ids]
+        for pos, (i, iid) in enumerate(zip(ids, self.shown)):
+            if iid in self.inserted:
+                self.tree.move(iid, "", pos)
+            else:
+                with self.lock:
+                    name, c, w, acc, m, wrongs = index.row(i)
+                self.tree.insert("", pos, iid=iid, values=(name, c, w, f"{acc:.1f}", format_mastery(m), truncate(wrongs)))
+                self.inserted.add(iid)
+
+        shown = f"{len(ids)} of {matches} matches" if matches > len(ids) else f"{matches} matches"
+        self.match_label.config(text=f"{shown} ({len(index)} {self.level_var.get()})")
 
     def on_double_click(self, event):
         item = self.tree.identify_row(event.y)
@@ -554,8 +891,9 @@ class StatsWindow(tk.Toplevel):
             return
         values = self.tree.item(item, "values")
         key = values[0]
-        rec = self.db.get(key, {})
-        full_text = ", ".join(rec.get("wrong_log", [])) or "(none)"
+        with self.lock:
+            rec = self.tables[self.level_var.get()].get(key, {})
+            full_text = ", ".join(wrong_answers(rec)) or "(none)"
         show_full_text_popup(self, "Full Reflection", full_text)
 
 
@@ -564,47 +902,56 @@ class StatsWindow(tk.Toplevel):
 # -------------------------------------------------------
 
 class TopicStatsWindow(tk.Toplevel):
-    def __init__(self, master, topic, db):
+    def __init__(self, master, topic, db, charts=None, lock=None):
         super().__init__(master)
         self.title(f"Captain's log for '{topic}'")
-        self.geometry("600x400")
+        self.lock = lock or nullcontext()   # writer.lock, see StatsWindow
+        self.geometry("680x700" if charts else "600x400")
 
-        tk.Label(self, text=f"Past performance in topic: {topic}",
+        notebook = ttk.Notebook(self)
+        notebook.pack(fill="both", expand=True)
+        table_tab = tk.Frame(notebook)
+        notebook.add(table_tab, text="Log")
+        if charts is not None:
+            add_chart_tab(notebook, charts)
+
+        tk.Label(table_tab, text=f"Past performance in topic: {topic}",
                  font=("Arial", 11, "bold")).pack(anchor="w", padx=10, pady=5)
 
-        frame = tk.Frame(self)
+        frame = tk.Frame(table_tab)
         frame.pack(fill="both", expand=True, pady=10)
 
         self.db_local = db
 
         self.tree = ttk.Treeview(
             frame,
-            columns=("name", "correct", "wrong", "accuracy", "wrongs"),
+            columns=("name", "correct", "wrong", "accuracy", "mastery", "wrongs"),
             show="headings"
         )
 
-        for col in ("name", "correct", "wrong", "accuracy", "wrongs"):
+        for col in ("name", "correct", "wrong", "accuracy", "mastery", "wrongs"):
             self.tree.heading(col, text=col.capitalize())
 
-        self.tree.column("name", width=220)
-        self.tree.column("correct", width=80, anchor="center")
-        self.tree.column("wrong", width=80, anchor="center")
-        self.tree.column("accuracy", width=100, anchor="center")
-        self.tree.column("wrongs", width=200)
+        self.tree.column("name", width=200)
+        self.tree.column("correct", width=70, anchor="center")
+        self.tree.column("wrong", width=70, anchor="center")
+        self.tree.column("accuracy", width=80, anchor="center")
+        self.tree.column("mastery", width=80, anchor="center")
+        self.tree.column("wrongs", width=160)
 
         self.tree.pack(fill="both", expand=True, padx=10, pady=5)
         self.tree.bind("<Double-1>", self.on_double_click)
 
-        for name, rec in sorted(db.items()):
-            c = rec.get("correct", 0)
-            w = rec.get("wrong", 0)
-            acc = (c / (c + w)) * 100 if (c + w) else 0
-            full_wrong = ", ".join(rec.get("wrong_log", []))
-            self.tree.insert(
-                "",
-                "end",
-                values=(name, c, w, f"{acc:.1f}", truncate(full_wrong))
-            )
+        with self.lock:
+            rows = []
+            for name, rec in sorted(db.items()):
+                c = rec.get("correct", 0)
+                w = rec.get("wrong", 0)
+                acc = (c / (c + w)) * 100 if (c + w) else 0
+                full_wrong = ", ".join(wrong_answers(rec))
+                rows.append((name, c, w, f"{acc:.1f}", format_mastery(mastery(rec)), truncate(full_wrong)))
+        for values in rows:
+            self.tree.insert("", "end", values=values)
 
         tk.Button(self, text="Dive in", command=self.destroy).pack(pady=5)
 
@@ -614,8 +961,8 @@ class TopicStatsWindow(tk.Toplevel):
             return
         vals = self.tree.item(item, "values")
         key = vals[0]
-        rec = self.db_local.get(key, {})
-        full = ", ".join(rec.get("wrong_log", [])) or "(none)"
+        with self.lock:
+            full = ", ".join(wrong_answers(self.db_local.get(key, {}))) or "(none)"
         show_full_text_popup(self, "Full Reflection", full)
 
 
@@ -624,7 +971,15 @@ class TopicStatsWindow(tk.Toplevel):
 # -------------------------------------------------------
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drill the cards under learn/ or from a deck bundle.")
+    parser.add_argument("bundle", nargs="?", help="deck bundle built with bundle_utils.py")
+    args = parser.parse_args()
+
     print("Jürgen ProcKnow initializing cognitive torpedoes...")
     print("Periscope depth! All minds to learning stations!")
-    app = LearnApp()
+    bundle = None
+    if args.bundle:
+        from bundle_utils import open_bundle
+        bundle = open_bundle(args.bundle)
+    app = LearnApp(bundle)
     app.mainloop()
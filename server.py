@@ -0,0 +1,541 @@
+import argparse, asyncio, json, os, random, re, secrets, time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qs, quote
+
+from card_utils import (
+    list_folders, list_topics, load_cards, generate_card, use_worker_pool, use_bundle,
+    compare_detail, format_answer, split_math, is_math, render_latex_png,
+)
+from stats_utils import (
+    load_progress, update_card_result, ProgressWriter, SAVE_EVERY_INTERVAL,
+    adopt_legacy_instances, weak_cards, get_accuracy, wrong_answers,
+)
+
+# -------------------------------------------------------
+# Local multi-user practice server
+#
+#   python server.py [--host 127.0.0.1] [--port 8000] [--processes N] [--bundle deck.zip]
+#
+# Serves the learn/ folders to browsers. Every user gets their own
+# progress store (progress_<folder>.<user>.json), generators run in a
+# shared thread pool so a slow one only blocks its own session.
+# Same warning as the app: every card is executed as Python code.
+# -------------------------------------------------------
+
+GENERATOR_TIMEOUT = 10.0   # seconds per topic load / repeat
+SESSION_TTL = 2 * 3600     # idle sessions are dropped after this
+KEEPALIVE_TIMEOUT = 30.0
+MAX_HEADER = 16 * 1024
+MAX_BODY = 64 * 1024
+
+USER_RE = re.compile(r"[A-Za-z0-9_-]{1,32}")
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Session:
+    def __init__(self, sid, user, folder, store, db, due):
+        self.sid = sid
+        self.user = user
+        self.folder = folder
+        self.store = store
+        self.db = db
+        self.due = due
+        self.current = None
+        self.repeat_counter = 0
+        self.repeat_target = 0
+        self.proposed_ok = None
+        self.user_answer = None
+        self.last_seen = time.monotonic()
+
+
+def user_store(folder, user):
+    """Name of the per-user progress store for a folder."""
+    return f"{folder}.{user}"
+
+
+class PracticeServer:
+    def __init__(self, workers=8, save_interval=5.0):
+        self.workers = workers
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="generator")
+        self._hung = set()        # timed-out generator calls still holding a thread of self.pool
+        # rendering is serialized in card_utils anyway, keep it off the generator threads
+        self.render_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="latex")
+        self.writer = ProgressWriter(SAVE_EVERY_INTERVAL, save_interval)
+        self.sessions = {}
+        self.stores = {}          # store name -> db
+        self._store_locks = {}    # store name -> asyncio.Lock (first load only)
+
+    # ---------------------------------------------------
+    async def run_generator(self, func, *args):
+        call = self.pool.submit(func, *args)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(call), GENERATOR_TIMEOUT)
+        except asyncio.TimeoutError:
+            if not call.done():
+                self._retire_hung(call)
+            raise
+
+    def _retire_hung(self, call):
+        """
+        A thread cannot be stopped, so a hung call keeps its pool thread.
+        Once half the threads are stuck, new calls go to a fresh pool; the
+        old one lets its threads go as their calls return.
+        """
+        hung = self._hung
+        hung.add(call)
+        call.add_done_callback(hung.discard)
+        if len(hung) >= max(1, self.workers // 2):
+            print(f"{len(hung)} generator calls hung, starting a fresh generator pool")
+            old, self.pool = self.pool, ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="generator")
+            self._hung = set()
+            old.shutdown(wait=False)
+
+    async def get_store(self, folder, user):
+        store = user_store(folder, user)
+        if store not in self.stores:
+            lock = self._store_locks.setdefault(store, asyncio.Lock())
+            async with lock:
+                if store not in self.stores:
+                    loop = asyncio.get_running_loop()
+                    self.stores[store] = await loop.run_in_executor(self.pool, load_progress, store)
+        return store, self.stores[store]
+
+    def get_session(self, sid):
+        session = self.sessions.get(sid)
+        if session is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, "Unknown or expired session.")
+        session.last_seen = time.monotonic()
+        return session
+
+    async def expire_sessions(self):
+        while True:
+            await asyncio.sleep(60)
+            cutoff = time.monotonic() - SESSION_TTL
+            for sid in [s.sid for s in self.sessions.values() if s.last_seen < cutoff]:
+                del self.sessions[sid]
+
+    # ---------------------------------------------------
+    # session flow (mirrors LearnApp.next_card)
+    # ---------------------------------------------------
+
+    async def start_session(self, body):
+        user = str(body.get("user", ""))
+        folder = str(body.get("folder", ""))
+        topic = str(body.get("topic", ""))
+        if not USER_RE.fullmatch(user):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "User names are 1-32 letters, digits, '_' or '-'.")
+        if folder not in list_folders() or topic not in list_topics(folder):
+            raise HTTPError(HTTPStatus.NOT_FOUND, "Unknown folder or topic.")
+
+        full_topic = f"{folder}.{topic}"
+        store, db = await self.get_store(folder, user)
+        try:
+            cards = await self.run_generator(load_cards, full_topic)
+        except asyncio.TimeoutError:
+            raise HTTPError(HTTPStatus.GATEWAY_TIMEOUT, "Generating the cards took too long.")
+
+        self.writer.apply(store, db, adopt_legacy_instances, cards)
+        due = cards[:]
+        if body.get("only_weak"):
+            with self.writer.lock:   # the writer merges other processes' answers into db
+                due = weak_cards(due, db)
+        random.shuffle(due)
+
+        sid = secrets.token_urlsafe(16)
+        session = Session(sid, user, folder, store, db, due)
+        self.sessions[sid] = session
+        await self.next_card(session)
+        return {"session": sid, "card": self.card_view(session)}
+
+    async def next_card(self, session):
+        if (
+            session.repeat_target > 0
+            and session.repeat_counter < session.repeat_target
+            and session.current is not None
+        ):
+            session.repeat_counter += 1
+            try:
+                session.current = await self.run_generator(
+                    generate_card, session.current["topic"], session.current["_func_name"])
+            except Exception as e:
+                print("Repeat error:", e)
+        else:
+            session.repeat_counter = 0
+            session.repeat_target = 0
+            if not session.due:
+                session.current = None
+                return
+            session.current = session.due.pop()
+            session.repeat_target = session.current.get("repeat", 0)
+            session.repeat_counter = 1
+        session.proposed_ok = None
+        session.user_answer = None
+
+    def card_view(self, session):
+        card = session.current
+        if card is None:
+            return {"done": True, "remaining": 0}
+        return {
+            "done": False,
+            "remaining": len(session.due),
+            "question": render_parts(card["question"]),
+            "has_hint": "hint" in card,
+        }
+
+    async def answer(self, session, body):
+        if session.current is None:
+            raise HTTPError(HTTPStatus.CONFLICT, "No card to answer.")
+        user = str(body.get("answer", ""))
+        session.user_answer = user
+        session.proposed_ok, detail = compare_detail(user, session.current)
+        return {"ok": session.proposed_ok, "answer": user,
+                "correct": format_answer(session.current), "detail": detail}
+
+    async def verdict(self, session, body):
+        if session.current is None or session.proposed_ok is None:
+            raise HTTPError(HTTPStatus.CONFLICT, "Answer the card first.")
+        ok = session.proposed_ok if not body.get("override") else not session.proposed_ok
+        update_card_result(session.current, session.db, ok,
+                           user_answer=session.user_answer,
+                           writer=self.writer, folder_name=session.store)
+        await self.next_card(session)
+        return {"card": self.card_view(session)}
+
+    def stats(self, query):
+        user = query.get("user", "")
+        folder = query.get("folder", "")
+        db = self.stores.get(user_store(folder, user))
+        if db is None:
+            return {"rows": []}
+        rows = []
+        with self.writer.lock:
+            for key, rec in db["generators"].items():
+                rows.append({
+                    "name": key,
+                    "correct": rec.get("correct", 0),
+                    "wrong": rec.get("wrong", 0),
+                    "accuracy": round(get_accuracy(rec) * 100, 1),
+                    "wrongs": wrong_answers(rec),
+                })
+        rows.sort(key=lambda r: r["accuracy"])
+        return {"rows": rows}
+
+    # ---------------------------------------------------
+    # HTTP
+    # ---------------------------------------------------
+
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        path = url.path
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        if method == "GET" and path == "/":
+            return HTTPStatus.OK, "text/html; charset=utf-8", INDEX_HTML.encode("utf-8"), {}
+        if method == "GET" and path == "/math.png":
+            loop = asyncio.get_running_loop()
+            png = await loop.run_in_executor(self.render_pool, render_latex_png, query.get("tex", ""))
+            if png is None:
+                raise HTTPError(HTTPStatus.UNPROCESSABLE_ENTITY, "Cannot render formula.")
+            # the URL is the formula, so the image never changes
+            return HTTPStatus.OK, "image/png", png, {"Cache-Control": "public, max-age=86400"}
+        if method == "GET" and path == "/api/folders":
+            return json_response({"folders": list_folders()})
+        if method == "GET" and path == "/api/topics":
+            folder = query.get("folder", "")
+            if folder not in list_folders():
+                raise HTTPError(HTTPStatus.NOT_FOUND, "Unknown folder.")
+            return json_response({"topics": list_topics(folder)})
+        if method == "GET" and path == "/api/stats":
+            return json_response(self.stats(query))
+        if method == "POST" and path == "/api/session":
+            return json_response(await self.start_session(parse_json(body)))
+
+        m = re.fullmatch(r"/api/session/([A-Za-z0-9_-]+)/(card|hint|answer|verdict)", path)
+        if m:
+            session = self.get_session(m.group(1))
+            action = m.group(2)
+            if method == "GET" and action == "card":
+                return json_response({"card": self.card_view(session)})
+            if method == "GET" and action == "hint":
+                hint = session.current.get("hint", "") if session.current else ""
+                return json_response({"hint": render_parts(hint)})
+            if method == "POST" and action == "answer":
+                return json_response(await self.answer(session, parse_json(body)))
+            if method == "POST" and action == "verdict":
+                return json_response(await self.verdict(session, parse_json(body)))
+        raise HTTPError(HTTPStatus.NOT_FOUND, "Not found.")
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                        asyncio.TimeoutError, ConnectionError):
+                    break
+
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    await send(writer, *error_response(HTTPStatus.BAD_REQUEST, "Bad request line."), False)
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        k, v = line.split(":", 1)
+                        headers[k.strip().lower()] = v.strip()
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+
+                try:
+                    length = int(headers.get("content-length", "0") or 0)
+                    if length < 0:
+                        raise ValueError(length)
+                except ValueError:
+                    await send(writer, *error_response(HTTPStatus.BAD_REQUEST, "Bad Content-Length."), False)
+                    break
+                if length > MAX_BODY:
+                    await send(writer, *error_response(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Body too large."), False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                try:
+                    response = await self.dispatch(method, target, body)
+                except HTTPError as e:
+                    response = error_response(e.status, str(e))
+                except Exception as e:
+                    print("Server error:", target, e)
+                    response = error_response(HTTPStatus.INTERNAL_SERVER_ERROR, "Internal error.")
+                await send(writer, *response, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER)
+        expiry = asyncio.create_task(self.expire_sessions())
+        print(f"Jürgen ProcKnow server on http://{host}:{port}/")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            expiry.cancel()
+
+    def close(self):
+        self.writer.close()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.render_pool.shutdown(wait=False, cancel_futures=True)
+
+
+# -------------------------------------------------------
+# Helpers
+# -------------------------------------------------------
+
+def render_parts(text):
+    """Question/hint text as prose parts and URLs of server-rendered math."""
+    parts = []
+    for part in split_math(text):
+        if is_math(part):
+            parts.append({"math": "/math.png?tex=" + quote(part, safe="")})
+        else:
+            parts.append({"text": part})
+    return parts
+
+def parse_json(body):
+    try:
+        data = json.loads(body or b"{}")
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Body is not JSON.")
+    if not isinstance(data, dict):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object.")
+    return data
+
+def json_response(data):
+    return HTTPStatus.OK, "application/json", json.dumps(data).encode("utf-8"), {}
+
+def error_response(status, message):
+    payload = json.dumps({"error": message}).encode("utf-8")
+    return status, "application/json", payload, {}
+
+async def send(writer, status, content_type, payload, extra_headers, keep_alive):
+    head = [
+        f"HTTP/1.1 {status.value} {status.phrase}",
+        f"Content-Type: {content_type}",
+        f"Content-Length: {len(payload)}",
+        "Connection: " + ("keep-alive" if keep_alive else "close"),
+    ]
+    head += [f"{k}: {v}" for k, v in extra_headers.items()]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + payload)
+    await writer.drain()
+
+
+INDEX_HTML = """<!doctype html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>J&uuml;rgen ProcKnow</title>
+<style>
+  body { font-family: Arial, sans-serif; max-width: 820px; margin: 20px auto; background: #f8f8f8; }
+  #question { background: white; padding: 12px; min-height: 120px; white-space: pre-wrap; line-height: 1.8; }
+  #question img, #hint img { vertical-align: middle; }
+  #hint { font-style: italic; color: #555; margin: 6px 0; }
+  .ok { color: green; } .bad { color: red; }
+  table { border-collapse: collapse; width: 100%; margin-top: 10px; }
+  td, th { border: 1px solid #ccc; padding: 2px 6px; font-size: 13px; }
+  button:disabled { opacity: 0.4; }
+</style>
+</head>
+<body>
+<h2>J&uuml;rgen ProcKnow</h2>
+<div>
+  <input id="user" placeholder="your name" size="12">
+  <label><input type="checkbox" id="weak"> Only mastery &lt;75%</label>
+  <select id="folder"></select>
+  <select id="topic"></select>
+  <button onclick="startSession()">Load Topic</button>
+  <button onclick="showStats()">Show Stats</button>
+</div>
+<p id="status"></p>
+<div id="question"></div>
+<p>
+  <input id="answer" size="40" onkeydown="if (event.key === 'Enter') fire()">
+  <button onclick="fire()">Fire!</button>
+  <button id="hintBtn" onclick="hint()" disabled>Periscope (hint)</button>
+</p>
+<div id="hint"></div>
+<p id="feedback"></p>
+<p>
+  <button id="acceptBtn" onclick="verdict(false)" disabled>Accept verdict</button>
+  <button id="overrideBtn" onclick="verdict(true)" disabled>Override verdict</button>
+</p>
+<div id="stats"></div>
+<script>
+let sid = null;
+const $ = id => document.getElementById(id);
+
+async function api(method, path, body) {
+  const r = await fetch(path, {method, headers: {"Content-Type": "application/json"},
+                               body: body ? JSON.stringify(body) : undefined});
+  const data = await r.json();
+  if (!r.ok) { alert(data.error || r.status); throw new Error(data.error); }
+  return data;
+}
+
+function renderParts(el, parts) {
+  el.innerHTML = "";
+  for (const p of parts) {
+    if (p.math) { const img = document.createElement("img"); img.src = p.math; el.appendChild(img); }
+    else el.appendChild(document.createTextNode(p.text));
+  }
+}
+
+function showCard(card) {
+  $("hint").innerHTML = ""; $("feedback").textContent = ""; $("answer").value = "";
+  $("acceptBtn").disabled = $("overrideBtn").disabled = true;
+  if (card.done) {
+    $("question").textContent = "All objectives complete. Returning to harbor!";
+    $("status").textContent = "0 cards remaining.";
+    $("hintBtn").disabled = true;
+    return;
+  }
+  renderParts($("question"), card.question);
+  $("status").textContent = card.remaining + " cards remaining";
+  $("hintBtn").disabled = !card.has_hint;
+  $("answer").focus();
+}
+
+async function loadFolders() {
+  const d = await api("GET", "/api/folders");
+  $("folder").innerHTML = d.folders.map(f => `<option>${f}</option>`).join("");
+  await loadTopics();
+}
+
+async function loadTopics() {
+  const d = await api("GET", "/api/topics?folder=" + encodeURIComponent($("folder").value));
+  $("topic").innerHTML = d.topics.map(t => `<option>${t}</option>`).join("");
+}
+
+async function startSession() {
+  const d = await api("POST", "/api/session", {user: $("user").value, folder: $("folder").value,
+                                               topic: $("topic").value, only_weak: $("weak").checked});
+  sid = d.session;
+  showCard(d.card);
+}
+
+async function fire() {
+  if (!sid) return;
+  const d = await api("POST", `/api/session/${sid}/answer`, {answer: $("answer").value});
+  $("feedback").className = d.ok ? "ok" : "bad";
+  $("feedback").textContent = `System verdict: ${d.ok ? "CORRECT" : "WRONG"} - Your answer: ${d.answer} - Correct: ${d.correct}` + (d.detail ? ` - ${d.detail}` : "");
+  $("hintBtn").disabled = true;
+  $("acceptBtn").disabled = $("overrideBtn").disabled = false;
+}
+
+async function hint() {
+  const d = await api("GET", `/api/session/${sid}/hint`);
+  renderParts($("hint"), d.hint);
+  $("hintBtn").disabled = true;
+}
+
+async function verdict(override) {
+  const d = await api("POST", `/api/session/${sid}/verdict`, {override});
+  showCard(d.card);
+}
+
+async function showStats() {
+  const q = `user=${encodeURIComponent($("user").value)}&folder=${encodeURIComponent($("folder").value)}`;
+  const d = await api("GET", "/api/stats?" + q);
+  const esc = s => String(s).replace(/[&<>]/g, c => ({"&": "&amp;", "<": "&lt;", ">": "&gt;"}[c]));
+  $("stats").innerHTML = "<table><tr><th>Name</th><th>Correct</th><th>Wrong</th><th>Accuracy</th><th>Wrongs</th></tr>" +
+    d.rows.map(r => `<tr><td>${esc(r.name)}</td><td>${r.correct}</td><td>${r.wrong}</td>` +
+                    `<td>${r.accuracy}</td><td>${esc(r.wrongs.join(", "))}</td></tr>`).join("") + "</table>";
+}
+
+$("folder").onchange = loadTopics;
+loadFolders();
+</script>
+</body>
+</html>
+"""
+
+
+# -------------------------------------------------------
+# Main
+# -------------------------------------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the learn/ folders to browsers on this machine.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=min(32, (os.cpu_count() or 1) + 4),
+                        help="threads running card generators")
+    parser.add_argument("--save-interval", type=float, default=5.0,
+                        help="seconds between progress writes")
+    parser.add_argument("--processes", type=int, default=0,
+                        help="run generators in this many warm worker processes (0: in the server)")
+    parser.add_argument("--bundle", help="serve the cards of a deck bundle (bundle_utils.py) instead of learn/")
+    args = parser.parse_args()
+
+    if args.bundle:
+        from bundle_utils import open_bundle
+        use_bundle(open_bundle(args.bundle))
+    elif args.processes > 0:
+        from worker_pool import WorkerPool
+        use_worker_pool(WorkerPool(args.processes, timeout=GENERATOR_TIMEOUT))
+
+    server = PracticeServer(args.workers, args.save_interval)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
@@ -0,0 +1,65 @@
+import json
+import os
+import time
+
+from stats_utils import atomic_write
+
+# -----------------------------------------------
+# Session snapshots, so a closed app can pick up where it left off
+#
+# Cards are stored as references, [generator name, seed]: rebuilding a
+# card runs its generator again with the same seed. Async generators have
+# no seed (None) and give a fresh card of the same generator instead.
+# -----------------------------------------------
+
+SESSION_FILE = "session.json"
+SESSION_VERSION = 1
+
+
+def card_ref(card):
+    """A card in a queue: a card dict, or a ref already (not rebuilt yet)."""
+    if isinstance(card, list):
+        return card
+    return [card["_func_name"], card.get("_seed")]
+
+
+def save_session(topic, current, due, pending=(), repeat_counter=0, repeat_target=0, mode="all"):
+    """
+    Snapshot a running session: `current` and `due` hold cards or refs,
+    `pending` the names of generators whose cards have not arrived yet,
+    `mode` which cards the session takes (see MODES in main.py).
+    """
+    folder, _, topic_name = topic.partition(".")
+    state = {
+        "version": SESSION_VERSION,
+        "saved": time.time(),
+        "folder": folder,
+        "topic": topic_name,
+        "mode": mode,
+        "current": card_ref(current) if current is not None else None,
+        "repeat_counter": repeat_counter,
+        "repeat_target": repeat_target,
+        "due": [card_ref(c) for c in due],
+        "pending": list(pending),
+    }
+    # a lost snapshot only costs the resume offer, no need to fsync
+    atomic_write(SESSION_FILE, json.dumps(state, separators=(",", ":")), durable=False)
+
+
+def load_session():
+    """The last snapshot, or None if there is none (or it is unreadable)."""
+    try:
+        with open(SESSION_FILE, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(state, dict) or state.get("version") != SESSION_VERSION:
+        return None
+    return state
+
+
+def clear_session():
+    try:
+        os.remove(SESSION_FILE)
+    except OSError:
+        pass
@@ -0,0 +1,94 @@
+import json
+import lzma
+import struct
+import zlib
+
+# -----------------------------------------------
+# Compact binary snapshots of progress DBs
+#
+# Layout (all integers big-endian):
+#   magic   6 bytes  b"PKSNAP"
+#   version 1 byte
+#   codec   1 byte   1 = zlib, 2 = lzma
+#   length  8 bytes  size of the compressed payload
+#   crc32   4 bytes  of the compressed payload
+#   payload          compressed compact JSON of the DB
+#
+# The payload is the same JSON as progress_<folder>.json, so converting
+# between the two formats is lossless.
+# -----------------------------------------------
+
+MAGIC = b"PKSNAP"
+VERSION = 1
+HEADER = struct.Struct(">6sBBQI")
+
+CODECS = {"zlib": 1, "lzma": 2}
+_CODEC_NAMES = {v: k for k, v in CODECS.items()}
+
+# fast levels: a snapshot is rewritten on every save
+ZLIB_LEVEL = 3
+LZMA_PRESET = 1
+
+
+def is_snapshot(data):
+    return data[:len(MAGIC)] == MAGIC
+
+
+def encode_snapshot(text, codec="zlib"):
+    """Pack already serialized DB JSON (str) into a snapshot."""
+    raw = text.encode("utf-8")
+    if codec == "zlib":
+        payload = zlib.compress(raw, ZLIB_LEVEL)
+    elif codec == "lzma":
+        payload = lzma.compress(raw, preset=LZMA_PRESET)
+    else:
+        raise ValueError(f"Unknown snapshot codec: {codec}")
+    header = HEADER.pack(MAGIC, VERSION, CODECS[codec], len(payload), zlib.crc32(payload))
+    return header + payload
+
+
+def decode_snapshot(data):
+    """Return (db, codec) from snapshot bytes. Raises ValueError if damaged."""
+    if len(data) < HEADER.size:
+        raise ValueError("Snapshot is truncated.")
+    magic, version, codec_id, length, crc = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a progress snapshot.")
+    if version != VERSION:
+        raise ValueError(f"Unsupported snapshot version {version}.")
+    codec = _CODEC_NAMES.get(codec_id)
+    if codec is None:
+        raise ValueError(f"Unknown snapshot codec id {codec_id}.")
+    payload = data[HEADER.size:HEADER.size + length]
+    if len(payload) != length:
+        raise ValueError("Snapshot is truncated.")
+    if zlib.crc32(payload) != crc:
+        raise ValueError("Snapshot checksum mismatch.")
+    raw = zlib.decompress(payload) if codec == "zlib" else lzma.decompress(payload)
+    return json.loads(raw), codec
+
+
+def snapshot_codec(path):
+    """Codec of the snapshot at `path`, read from its header only."""
+    with open(path, "rb") as f:
+        head = f.read(HEADER.size)
+    if len(head) < HEADER.size or not is_snapshot(head):
+        return None
+    return _CODEC_NAMES.get(HEADER.unpack(head)[2])
+
+
+if __name__ == "__main__":
+    import argparse
+    from stats_utils import set_progress_format, progress_format, PROGRESS_FORMATS
+
+    parser = argparse.ArgumentParser(description="Convert a folder's progress between JSON and snapshots.")
+    parser.add_argument("folder")
+    parser.add_argument("format", nargs="?", choices=PROGRESS_FORMATS,
+                        help="target format (omit to show the current one)")
+    args = parser.parse_args()
+
+    if args.format is None:
+        print(progress_format(args.folder))
+    else:
+        set_progress_format(args.folder, args.format)
+        print(f"{args.folder}: progress stored as {args.format}")
@@ -0,0 +1,137 @@
+import bisect
+
+import numpy as np
+
+from stats_utils import wrong_answers, mastery
+
+# -----------------------------------------------
+# Search index for the Captain's Log
+#
+# Built once per table (generators or single cards) so that every
+# keystroke in the search box is a few array operations:
+#   substring  all keys, lowercased, in one string; str.find jumps
+#              between matches and np.searchsorted maps them to rows
+#   prefix     keys and key names (last part) sorted, found by bisect
+#   filters    topic, accuracy, attempts and wrong answers as arrays
+#   sorting    one argsort per column, computed on first use
+# -----------------------------------------------
+
+NARROW_LIMIT = 5000   # re-check earlier hits directly when there are fewer
+DENSE = 0.1           # matches per key above which scanning the keys beats find()
+
+
+def _topic(key):
+    parts = key.split(".", 2)
+    return parts[1] if len(parts) == 3 else ""
+
+
+def _prefix_range(sorted_keys, prefix):
+    lo = bisect.bisect_left(sorted_keys, prefix)
+    hi = bisect.bisect_left(sorted_keys, prefix + "\uffff")
+    return lo, hi
+
+
+class LogIndex:
+    def __init__(self, table):
+        self.table = table
+        self.keys = list(table)
+        n = len(self.keys)
+        recs = [table[k] for k in self.keys]
+
+        self.correct = np.fromiter((r.get("correct", 0) for r in recs), dtype=np.int64, count=n)
+        self.wrong = np.fromiter((r.get("wrong", 0) for r in recs), dtype=np.int64, count=n)
+        self.attempts = self.correct + self.wrong
+        self.accuracy = np.divide(self.correct * 100.0, self.attempts,
+                                  out=np.zeros(n), where=self.attempts > 0)
+        self.has_wrongs = np.fromiter((bool(r.get("wrong_log")) for r in recs), dtype=bool, count=n)
+
+        topics = [_topic(k) for k in self.keys]
+        self.topics = sorted(set(topics))
+        topic_id = {t: i for i, t in enumerate(self.topics)}
+        self.topic_ids = np.fromiter((topic_id[t] for t in topics), dtype=np.int32, count=n)
+
+        self.lower = [k.lower() for k in self.keys]
+        self.blob = "\n".join(self.lower)
+        self.starts = np.cumsum([0] + [len(k) + 1 for k in self.lower[:-1]])
+
+        by_key = sorted(range(n), key=self.lower.__getitem__)
+        self.sorted_keys = [self.lower[i] for i in by_key]
+        self.sorted_key_ids = np.array(by_key, dtype=np.int64)
+        names = [k.rsplit(".", 1)[-1] for k in self.lower]
+        by_name = sorted(range(n), key=names.__getitem__)
+        self.sorted_names = [names[i] for i in by_name]
+        self.sorted_name_ids = np.array(by_name, dtype=np.int64)
+
+        self._orders = {"name": self.sorted_key_ids}
+        self._last = None   # (query, prefix, matching ids) of the previous search
+
+    def __len__(self):
+        return len(self.keys)
+
+    # ---------------------------------------------------
+    def search(self, text, prefix=False):
+        """Ids of the rows whose key contains `text` (or starts with it, by key or name)."""
+        text = text.lower()
+        if prefix:
+            lo, hi = _prefix_range(self.sorted_keys, text)
+            lo2, hi2 = _prefix_range(self.sorted_names, text)
+            # may hold a row twice, callers only use the ids as a mask
+            ids = np.concatenate([self.sorted_key_ids[lo:hi], self.sorted_name_ids[lo2:hi2]])
+        elif self._narrowable(text):
+            # typing on: the new hits are among the previous ones
+            ids = np.array([i for i in self._last[2] if text in self.lower[i]], dtype=np.int64)
+        elif self.blob.count(text) > DENSE * len(self.keys):
+            ids = np.array([i for i, k in enumerate(self.lower) if text in k], dtype=np.int64)
+        else:
+            offsets = []
+            pos = self.blob.find(text)
+            while pos >= 0:
+                offsets.append(pos)
+                pos = self.blob.find(text, pos + 1)
+            ids = np.unique(np.searchsorted(self.starts, offsets, side="right") - 1)
+        self._last = (text, prefix, ids)
+        return ids
+
+    def _narrowable(self, text):
+        if self._last is None:
+            return False
+        last_text, last_prefix, last_ids = self._last
+        return not last_prefix and last_text in text and len(last_ids) < NARROW_LIMIT
+
+    def order(self, column, reverse=False):
+        """Row ids sorted by a column: name, correct, wrong or accuracy."""
+        if column not in self._orders:
+            values = {"correct": self.correct, "wrong": self.wrong, "accuracy": self.accuracy}[column]
+            self._orders[column] = np.argsort(values, kind="stable")
+        ids = self._orders[column]
+        return ids[::-1] if reverse else ids
+
+    def query(self, text="", prefix=False, topic=None, min_accuracy=0.0, max_accuracy=100.0,
+              min_attempts=0, has_wrongs=False, sort="accuracy", reverse=True, limit=None):
+        """
+        Ids of the matching rows in display order (at most `limit`) and the
+        number of matches.
+        """
+        mask = (self.accuracy >= min_accuracy) & (self.accuracy <= max_accuracy)
+        if min_attempts:
+            mask &= self.attempts >= min_attempts
+        if has_wrongs:
+            mask &= self.has_wrongs
+        if topic:
+            if topic not in self.topics:
+                return np.empty(0, dtype=np.int64), 0
+            mask &= self.topic_ids == self.topics.index(topic)
+        if text:
+            found = np.zeros(len(self.keys), dtype=bool)
+            found[self.search(text, prefix)] = True
+            mask &= found
+
+        order = self.order(sort, reverse)
+        hits = order[mask[order]]
+        return hits[:limit], len(hits)
+
+    def row(self, i):
+        """key, correct, wrong, accuracy (%), mastery (0..1 or None) and wrong answers of row `i`."""
+        rec = self.table[self.keys[i]]
+        return (self.keys[i], int(self.correct[i]), int(self.wrong[i]), float(self.accuracy[i]),
+                mastery(rec), ", ".join(wrong_answers(rec)))
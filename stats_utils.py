@@ -1,50 +1,757 @@
+import bisect
+import math
 import os
 import json
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+try:
+    import fcntl
+except ImportError:   # Windows
+    fcntl = None
+    import msvcrt
+
+from snapshot_utils import is_snapshot, encode_snapshot, decode_snapshot, snapshot_codec
 
 # -----------------------------------------------
 # Folder-specific progress DB helper utilities
 # -----------------------------------------------
 
+# Durability policies for ProgressWriter
+SAVE_EVERY_ANSWER = "answer"      # write as soon as a verdict comes in
+SAVE_EVERY_INTERVAL = "interval"  # write at most every `interval` seconds
+SAVE_ON_EXIT = "exit"             # write only on flush()/close()
+
+# Concrete instances kept per generator (most recently seen first)
+INSTANCE_RETENTION = 20
+
+# Storage formats of a folder's progress: indented JSON or a compressed snapshot
+PROGRESS_FORMATS = ("json", "zlib", "lzma")
+
+# Wrong answers kept per record
+WRONG_LOG_SIZE = 5
+
+# Mastery: accuracy with every answer losing half its weight per half-life
+MASTERY_HALF_LIFE = 7 * 24 * 3600.0   # seconds
+WEAK_THRESHOLD = 0.75                  # mastery below this counts as weak
+
+# Identifies this machine in per-device counters (see get_device_id)
+DEVICE_FILE = os.path.expanduser("~/.procknow_device")
+
+_device_id = None
+_formats = {}   # folder -> format, see progress_format
+
+
 def get_db_file(folder_name):
     """Return the file name for storing stats of a specific folder."""
     return f"progress_{folder_name}.json"
 
 
+def get_snapshot_file(folder_name):
+    """Return the file name of a folder's stats stored as a binary snapshot."""
+    return f"progress_{folder_name}.pks"
+
+
+def get_lock_file(folder_name):
+    """Return the file locked while a folder's stats are read and rewritten."""
+    return f"progress_{folder_name}.lock"
+
+
+@contextmanager
+def progress_lock(folder_name):
+    """
+    Hold the folder's lock file exclusively, across processes (and across
+    threads: every call opens the file anew, and the lock is taken per open file).
+    """
+    with open(get_lock_file(folder_name), "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:   # gave up after ~10s, keep waiting
+                    pass
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def progress_format(folder_name):
+    """
+    Return how a folder's stats are stored: "json", "zlib" or "lzma".
+    A snapshot file selects its codec, otherwise it is plain JSON.
+    """
+    if folder_name not in _formats:
+        snap = get_snapshot_file(folder_name)
+        fmt = "json"
+        if os.path.exists(snap):
+            try:
+                fmt = snapshot_codec(snap) or "zlib"
+            except OSError:
+                fmt = "zlib"
+        _formats[folder_name] = fmt
+    return _formats[folder_name]
+
+
+def set_progress_format(folder_name, fmt):
+    """Convert a folder's stored stats to another format (lossless)."""
+    if fmt not in PROGRESS_FORMATS:
+        raise ValueError(f"Unknown progress format: {fmt}")
+    old = progress_format(folder_name)
+    old_file = get_db_file(folder_name) if old == "json" else get_snapshot_file(folder_name)
+    with progress_lock(folder_name):
+        db = _read_db_file(old_file) if os.path.exists(old_file) else new_db()
+
+        _formats[folder_name] = fmt
+        path, data = _pack_progress(folder_name, serialize_progress(db, fmt))
+        atomic_write(path, data)
+        if old_file != path and os.path.exists(old_file):
+            os.remove(old_file)
+
+
+def get_device_id():
+    """
+    Return the id of this machine, creating it on first use.
+    PROCKNOW_DEVICE overrides it (e.g. for two checkouts on one machine).
+    """
+    global _device_id
+    if _device_id is None:
+        _device_id = os.environ.get("PROCKNOW_DEVICE")
+    if _device_id is None:
+        try:
+            with open(DEVICE_FILE) as f:
+                _device_id = f.read().strip() or None
+        except OSError:
+            pass
+    if _device_id is None:
+        _device_id = uuid.uuid4().hex[:12]
+        try:
+            with open(DEVICE_FILE, "w") as f:
+                f.write(_device_id)
+        except OSError:
+            pass
+    return _device_id
+
+
+def new_db():
+    """
+    Return an empty progress DB.
+
+    Stats are kept at two levels:
+      generators: "<topic>.<function name>"  -> record
+      instances:  "<topic>.<card name>"      -> record (+ "generator", "last")
+
+    A record holds per-device counters {"devices": {device: [correct, wrong]}}
+    with "correct"/"wrong" as their sums, per-device decayed sums
+    {"mastery": {device: [correct, attempts, time]}} (see mastery), a
+    "wrong_log" of [timestamp, answer] pairs and the "seq" of its last
+    change. "seq" of the DB counts changes; both maps are kept in order of
+    "seq" so recent changes sit at the end.
+    """
+    return {"seq": 0, "generators": {}, "instances": {}}
+
+
+def new_record():
+    return {"correct": 0, "wrong": 0, "wrong_log": [], "devices": {}, "seq": 0}
+
+
+def _upgrade_record(rec):
+    """Bring records from older files to the current layout."""
+    if "devices" not in rec:
+        c, w = rec.get("correct", 0), rec.get("wrong", 0)
+        # counts of unknown origin: identical on every copy of the old file,
+        # so merging them per device never double counts
+        rec["devices"] = {"legacy": [c, w]} if c + w else {}
+    rec["wrong_log"] = [e if isinstance(e, list) else [0, e] for e in rec.get("wrong_log", [])]
+    rec.setdefault("seq", 0)
+    if "mastery" not in rec:
+        # answers from before mastery was tracked count as given at the last visit
+        t = rec.get("last") or time.time()
+        rec["mastery"] = {d: [float(c), float(c + w), t] for d, (c, w) in rec["devices"].items() if c + w}
+    return rec
+
+
+def wrong_answers(rec):
+    """The logged wrong answers of a record, oldest first."""
+    return [e[1] if isinstance(e, list) else e for e in rec.get("wrong_log", [])]
+
+
+def _read_db_file(path):
+    """Read a progress file, JSON or snapshot (detected by its header)."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if is_snapshot(data):
+        return decode_snapshot(data)[0]
+    return json.loads(data)
+
+
 def load_progress(folder_name):
     """Load stats for the given folder."""
-    db_file = get_db_file(folder_name)
-    if os.path.exists(db_file):
+    try:
+        db = _read_progress(folder_name)
+    except Exception:
+        return new_db()
+    return db if db is not None else new_db()
+
+
+def _read_progress(folder_name):
+    """The folder's stored DB, None if there is none; raises if it is unreadable."""
+    db_file = get_snapshot_file(folder_name)
+    if not os.path.exists(db_file):
+        db_file = get_db_file(folder_name)
+    if not os.path.exists(db_file):
+        return None
+    db = _read_db_file(db_file)
+    if "generators" not in db:
+        # old flat layout: card key -> record
+        db = {"generators": {}, "instances": db}
+    db.setdefault("seq", 0)
+    for table in (db["generators"], db["instances"]):
+        for rec in table.values():
+            _upgrade_record(rec)
+    prune_instances(db)
+    return db
+
+
+def atomic_write(path, data, durable=True):
+    """
+    Write `data` (str or bytes) to `path` so that readers either see the
+    old file or the complete new one: temp file, fsync, rename.
+    `durable=False` skips the fsyncs, for files that may be lost on a
+    power cut but must never be half-written.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
         try:
-            with open(db_file, "r") as f:
-                return json.load(f)
-        except Exception:
-            return {}
-    return {}
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+    if not durable:
+        return
+    # make the rename itself durable (not supported on every platform)
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
 
+def serialize_progress(db, fmt="json"):
+    """JSON text of a DB: indented for plain files, compact inside snapshots."""
+    if fmt == "json":
+        return json.dumps(db, indent=2)
+    return json.dumps(db, separators=(",", ":"))
 
-def save_progress(folder_name, db):
-    """Save stats for the given folder."""
-    db_file = get_db_file(folder_name)
-    with open(db_file, "w") as f:
-        json.dump(db, f, indent=2)
 
+def _pack_progress(folder_name, text):
+    """Return (path, data) to write for a folder's serialized DB."""
+    fmt = progress_format(folder_name)
+    if fmt == "json":
+        return get_db_file(folder_name), text
+    return get_snapshot_file(folder_name), encode_snapshot(text, fmt)
 
-def update_card_result(card, db, success, user_answer=None):
+
+def save_progress(folder_name, db, ops=None, since=0, lock=None):
     """
-    Update stats for a card and save to the appropriate folder's DB.
+    Save stats for the given folder without losing what other processes
+    (a second window, a script) wrote to it meanwhile.
+
+    Under the folder's lock file the stored DB is read again. `ops` are the
+    changes this process made since its last save, as (function, args)
+    pairs replayed on the stored DB (see ProgressWriter.apply); without
+    them `db` is merged into it record by record, which is right for
+    records of other devices (sync imports) but keeps only the larger of
+    two same-device counters; its other top-level keys are copied. The
+    result is written, then records changed on disk after seq `since` are
+    merged back into `db`, holding `lock` while `db` is touched. Returns
+    the seq of the written DB.
+    """
+    lock = lock or nullcontext()
+    with progress_lock(folder_name):
+        try:
+            disk = _read_progress(folder_name)
+        except Exception as e:
+            print("Progress file unreadable, rewriting it from memory:", folder_name, e)
+            disk = None
+        if disk is None:
+            # nothing to replay on: `db` already holds the ops
+            disk, ops = new_db(), None
+        if ops is None:
+            with lock:
+                _merge_db(disk, db)
+                # bookmarks like sync's "last_export" travel with the DB
+                disk.update((k, v) for k, v in db.items() if k not in _DB_TABLES)
+        else:
+            for func, args in ops:
+                func(disk, *args)
+        text = serialize_progress(disk, progress_format(folder_name))
+        atomic_write(*_pack_progress(folder_name, text))
+
+    with lock:
+        _merge_db(db, disk, since if since <= disk["seq"] else 0)
+        db.update((k, v) for k, v in disk.items() if k not in _DB_TABLES)
+    return disk["seq"]
+
+
+_DB_TABLES = ("seq", "generators", "instances")
+
+
+def _merge_db(local, remote, since=0):
+    """Merge the records of `remote` changed after seq `since` into `local`."""
+    for name in ("generators", "instances"):
+        table = local[name]
+        changed = []
+        # tables are ordered by seq: walk back from the newest change
+        for key in reversed(remote[name]):
+            rec = remote[name][key]
+            if rec["seq"] <= since:
+                break
+            mine = table.get(key) or new_record()
+            if merge_record(mine, rec):
+                changed.append((key, mine))
+        for key, rec in reversed(changed):
+            touch_record(local, table, key, rec)
+
+
+class ProgressWriter:
+    """
+    Background writer for progress DBs.
+
+    `apply()` changes a db and logs the change; a worker thread later
+    replays the logged changes on the stored DB (see save_progress), so
+    bursts of verdicts collapse into a single write and other processes
+    writing the same folder keep their results. Mutations of a db handed
+    to the writer must happen while holding `writer.lock`.
+    """
+
+    def __init__(self, policy=SAVE_EVERY_INTERVAL, interval=5.0):
+        if policy not in (SAVE_EVERY_ANSWER, SAVE_EVERY_INTERVAL, SAVE_ON_EXIT):
+            raise ValueError(f"Unknown save policy: {policy}")
+        self.policy = policy
+        self.interval = interval
+        self.lock = threading.RLock()
+        self._io_lock = threading.Lock()  # keeps snapshots hitting disk in order
+        self._dirty = {}                  # folder -> (db, [(func, args), ...])
+        self._synced = {}                 # folder -> seq of the stored DB last seen
+        self._cond = threading.Condition()
+        self._closed = False
+        self._failed = False              # last write failed: back off before retrying
+        self._thread = None
+        if policy != SAVE_ON_EXIT:
+            self._thread = threading.Thread(target=self._run, name="ProgressWriter", daemon=True)
+            self._thread.start()
+
+    def apply(self, folder_name, db, func, *args):
+        """
+        Call func(db, *args) and schedule the change to be written for
+        `folder_name`. A change reporting False (nothing changed) is not logged.
+        """
+        with self.lock:
+            # db was loaded at this seq: the first save only pulls what came after
+            self._synced.setdefault(folder_name, db["seq"])
+            if func(db, *args) is False:
+                return
+        with self._cond:
+            self._dirty.setdefault(folder_name, (db, []))[1].append((func, args))
+            if self.policy == SAVE_EVERY_ANSWER:
+                self._cond.notify()
+
+    def flush(self):
+        """Write all pending changes now, on the calling thread."""
+        with self._cond:
+            pending, self._dirty = self._dirty, {}
+        self._write(pending)
+
+    def close(self):
+        """Flush pending changes and stop the worker thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self.policy == SAVE_EVERY_ANSWER:
+                    if self._failed:
+                        # wait for the interval or the next answer, not a busy retry loop
+                        self._failed = False
+                        self._cond.wait(self.interval)
+                    while not self._dirty and not self._closed:
+                        self._cond.wait()
+                else:
+                    self._cond.wait(self.interval)
+                if self._closed:
+                    return
+                pending, self._dirty = self._dirty, {}
+            self._write(pending)
+
+    def _write(self, pending):
+        with self._io_lock:
+            for folder_name, (db, ops) in pending.items():
+                try:
+                    self._synced[folder_name] = save_progress(
+                        folder_name, db, ops, self._synced.get(folder_name, 0), self.lock)
+                except Exception as e:
+                    print("Progress save failed:", folder_name, e)
+                    # keep the changes, ahead of newer ones, so the next round retries
+                    with self._cond:
+                        self._dirty.setdefault(folder_name, (db, []))[1][:0] = ops
+                        self._failed = True
+
+
+def generator_key(card):
+    """Return the generator-level key of a card, e.g. demo.arithmetic_demo.subtraction_simple."""
+    return f"{card['topic']}.{card.get('_func_name') or card['name']}"
+
+
+def instance_key(card):
+    """Return the instance-level key of a card, e.g. demo.arithmetic_demo.sub_7_3."""
+    return f"{card['topic']}.{card['name']}"
+
+
+def prune_instances(db, keep=INSTANCE_RETENTION):
+    """
+    Drop all but the `keep` most recently seen instances of each generator.
+    Instances from the old flat layout (no "generator") are left alone.
     """
-    folder = card["topic"].split(".")[0]     # e.g. number_theory.chapter3 → number_theory
-    key = f"{card['topic']}.{card['name']}"
+    counts = Counter(rec.get("generator") for rec in db["instances"].values())
+    over = {gen for gen, n in counts.items() if gen is not None and n > keep}
+    if not over:
+        return
+
+    by_gen = {}
+    for key, rec in db["instances"].items():
+        gen = rec.get("generator")
+        if gen in over:
+            by_gen.setdefault(gen, []).append((rec.get("last", 0), key))
+    for entries in by_gen.values():
+        entries.sort(reverse=True)
+        for _, key in entries[keep:]:
+            del db["instances"][key]
+
+
+def adopt_legacy_instances(db, cards):
+    """
+    Attach old flat-layout records to their generator when a freshly
+    generated card reproduces the old key (constant card names).
+    Returns False if there was nothing to adopt.
+    """
+    instances = db["instances"]
+    adopted = False
+    for card in cards:
+        key = instance_key(card)
+        if key not in instances or "generator" in instances[key]:
+            continue
+        adopted = True
+        gen = generator_key(card)
+        rec = touch_record(db, instances, key)
+        rec["generator"] = gen
+        g = touch_record(db, db["generators"], gen)
+        for device, (c, w) in rec["devices"].items():
+            counts = g["devices"].setdefault(device, [0, 0])
+            counts[0] += c
+            counts[1] += w
+        _sum_devices(g)
+        for device, entry in rec.get("mastery", {}).items():
+            _fold_mastery(g, device, entry)
+        g["wrong_log"] = sorted(g["wrong_log"] + rec["wrong_log"])[-WRONG_LOG_SIZE:]
+    return adopted
+
+
+def get_accuracy(rec):
+    c = rec.get("correct", 0)
+    w = rec.get("wrong", 0)
+    return c / (c + w) if (c + w) else 0
 
-    rec = db.get(key, {"correct": 0, "wrong": 0, "wrong_log": []})
 
-    if success:
-        rec["correct"] += 1
+def _decay(dt):
+    return math.exp(-math.log(2) * dt / MASTERY_HALF_LIFE)
+
+
+def _add_mastery(rec, device, success, now):
+    """Fold one answer into the device's decayed sums, O(1)."""
+    entry = rec.setdefault("mastery", {}).get(device)
+    if entry is None:
+        rec["mastery"][device] = [float(success), 1.0, now]
+    elif now >= entry[2]:
+        f = _decay(now - entry[2])
+        entry[:] = [entry[0] * f + success, entry[1] * f + 1.0, now]
     else:
-        rec["wrong"] += 1
-        if user_answer is not None:
-            rec["wrong_log"].append(user_answer)
-            rec["wrong_log"] = rec["wrong_log"][-5:]
+        # an older answer replayed late (see save_progress): same sums as in order
+        f = _decay(entry[2] - now)
+        entry[0] += success * f
+        entry[1] += f
+
+
+def _fold_mastery(rec, device, entry):
+    """Add a device's decayed sums from another record (both decayed to the later time)."""
+    mine = rec.setdefault("mastery", {}).get(device)
+    if mine is None:
+        rec["mastery"][device] = list(entry)
+        return
+    at = max(mine[2], entry[2])
+    f_mine, f_entry = _decay(at - mine[2]), _decay(at - entry[2])
+    mine[:] = [mine[0] * f_mine + entry[0] * f_entry, mine[1] * f_mine + entry[1] * f_entry, at]
+
+
+def mastery(rec):
+    """
+    Recency-weighted accuracy (0..1) of a record, None if never answered.
+    Every answer loses half its weight per MASTERY_HALF_LIFE, so a card
+    missed often long ago and answered right since is no longer weak.
+    Decay scales all sums alike: the score only changes with new answers.
+    """
+    entries = rec.get("mastery")
+    if not entries:
+        return None
+    latest = max(t for _, _, t in entries.values())
+    correct = attempts = 0.0
+    for c, n, t in entries.values():
+        f = _decay(latest - t)
+        correct += c * f
+        attempts += n * f
+    return correct / attempts if attempts > 0 else None
+
+
+class MasteryIndex:
+    """
+    Generators of a DB sorted by mastery per topic, so "the weakest N" and
+    "everything below X" are range queries. The index follows the DB by
+    seq: before a query, records changed since the last one are walked
+    back from the end of the table and moved to their new place.
+    `lock` guards the DB (writer.lock).
+    """
+
+    def __init__(self, db, lock=None):
+        self.db = db
+        self.lock = lock or nullcontext()
+        self._sorted = {}   # full topic -> [(mastery, key)], ascending
+        self._scores = {}   # key -> (full topic, mastery) as indexed
+        with self.lock:
+            self._seq = db["seq"]   # DB seq the index is up to date with
+            for key, rec in db["generators"].items():
+                score = mastery(rec)
+                if score is not None:
+                    topic = key.rsplit(".", 1)[0]
+                    self._sorted.setdefault(topic, []).append((score, key))
+                    self._scores[key] = (topic, score)
+        for entries in self._sorted.values():
+            entries.sort()
+
+    def sync(self):
+        with self.lock:
+            table = self.db["generators"]
+            changed = []
+            for key in reversed(table):
+                rec = table[key]
+                if rec["seq"] <= self._seq:
+                    break
+                changed.append((key, mastery(rec)))
+            self._seq = self.db["seq"]
+        for key, score in reversed(changed):
+            self._place(key, score)
+
+    def _place(self, key, score):
+        old = self._scores.pop(key, None)
+        if old is not None:
+            entries = self._sorted[old[0]]
+            del entries[bisect.bisect_left(entries, (old[1], key))]
+        if score is None:
+            return   # never answered: not ranked, never weak
+        topic = key.rsplit(".", 1)[0]
+        bisect.insort(self._sorted.setdefault(topic, []), (score, key))
+        self._scores[key] = (topic, score)
+
+    def weakest(self, topic, n):
+        """Keys of the `n` weakest answered generators of `topic` (e.g. "demo.arithmetic_demo")."""
+        self.sync()
+        return [key for _, key in self._sorted.get(topic, [])[:n]]
+
+    def below(self, topic, threshold=WEAK_THRESHOLD):
+        """Keys of the generators of `topic` with mastery below `threshold`."""
+        self.sync()
+        entries = self._sorted.get(topic, [])
+        return [key for _, key in entries[:bisect.bisect_left(entries, (threshold,))]]
+
+
+def weak_cards(cards, db, threshold=WEAK_THRESHOLD, index=None):
+    """
+    Keep the cards whose generator mastery is below `threshold`; cards
+    never answered are not weak. `index` (a MasteryIndex of db) saves
+    scoring every generator.
+    """
+    if index is not None:
+        weak = {key for topic in {c["topic"] for c in cards} for key in index.below(topic, threshold)}
+        return [c for c in cards if generator_key(c) in weak]
+    gens = db["generators"]
+    scores = {key: mastery(gens.get(key, {})) for key in {generator_key(c) for c in cards}}
+    return [c for c in cards if scores[generator_key(c)] is not None and scores[generator_key(c)] < threshold]
+
+
+def weakest_cards(cards, db, n, index=None):
+    """Keep the cards of the `n` weakest answered generators of each topic."""
+    topics = {c["topic"] for c in cards}
+    if index is not None:
+        keep = {key for topic in topics for key in index.weakest(topic, n)}
+    else:
+        gens = db["generators"]
+        keep = set()
+        for topic in topics:
+            scored = []
+            for key in {generator_key(c) for c in cards if c["topic"] == topic}:
+                score = mastery(gens.get(key, {}))
+                if score is not None:
+                    scored.append((score, key))
+            keep.update(key for _, key in sorted(scored)[:n])
+    return [c for c in cards if generator_key(c) in keep]
+
+
+def update_card_result(card, db, success, user_answer=None, writer=None, folder_name=None):
+    """
+    Update stats for a card and save to the appropriate folder's DB.
+
+    With a `writer` the save is handed to the background ProgressWriter,
+    otherwise the DB is written synchronously. Either way only this
+    answer is added to the stored DB, so processes sharing a folder do not
+    overwrite each other. `folder_name` overrides the store written to
+    (the server keeps one store per user and folder).
+    """
+    folder = folder_name or card["topic"].split(".")[0]     # e.g. number_theory.chapter3 → number_theory
+    # the time is part of the change, replaying it must not move it
+    args = (card, success, user_answer, time.time())
+
+    if writer is None:
+        _apply_result(db, *args)
+        save_progress(folder, db, [(_apply_result, args)])
+        return
+
+    writer.apply(folder, db, _apply_result, *args)
+
+
+def touch_record(db, table, key, rec=None):
+    """
+    Fetch (or create) a record that is about to change, give it the next
+    seq and move it to the end of its table. `rec` replaces the stored one.
+    """
+    old = table.pop(key, None)
+    if rec is None:
+        rec = old or new_record()
+    db["seq"] += 1
+    rec["seq"] = db["seq"]
+    table[key] = rec
+    return rec
+
+
+def _sum_devices(rec):
+    rec["correct"] = sum(c for c, _ in rec["devices"].values())
+    rec["wrong"] = sum(w for _, w in rec["devices"].values())
+
+
+def _apply_result(db, card, success, user_answer, now):
+    gen_key = generator_key(card)
+    device = get_device_id()
+
+    gen = touch_record(db, db["generators"], gen_key)
+    inst = touch_record(db, db["instances"], instance_key(card))
+    inst["generator"] = gen_key
+    inst["last"] = now
+
+    slot = 0 if success else 1
+    for rec in (gen, inst):
+        rec["devices"].setdefault(device, [0, 0])[slot] += 1
+        _sum_devices(rec)
+        _add_mastery(rec, device, success, now)
+    # per-day counts (generators only) for the progress charts
+    day = time.strftime("%Y-%m-%d", time.localtime(now))
+    gen.setdefault("days", {}).setdefault(device, {}).setdefault(day, [0, 0])[slot] += 1
+
+    if not success and user_answer is not None:
+        # the generator log names the instance, answers alone lack context there
+        gen["wrong_log"] = (gen["wrong_log"] + [[now, f"{card['name']}: {user_answer}"]])[-WRONG_LOG_SIZE:]
+        inst["wrong_log"] = (inst["wrong_log"] + [[now, user_answer]])[-WRONG_LOG_SIZE:]
+
+
+def merge_record(local, remote):
+    """
+    Merge `remote` into `local` (both records of the same key).
+
+    Counters grow only and every device's pair (daily pair, mastery sums) is
+    written by that device alone, so the one with more attempts is the newer
+    one. Wrong logs are unioned by timestamp. Returns True if `local` changed.
+    """
+    changed = False
+    for device, counts in remote.get("devices", {}).items():
+        mine = local["devices"].get(device)
+        if mine is None or sum(counts) > sum(mine):
+            local["devices"][device] = list(counts)
+            changed = True
+    if changed:
+        _sum_devices(local)
+
+    # decayed sums: per device, the one holding more (decayed) answers is newer
+    for device, entry in remote.get("mastery", {}).items():
+        mine = local.setdefault("mastery", {}).get(device)
+        if mine is None or _newer_mastery(entry, mine):
+            local["mastery"][device] = list(entry)
+            changed = True
+
+    # daily counts: per device and day, like the totals above
+    for device, days in remote.get("days", {}).items():
+        mine = local.setdefault("days", {}).setdefault(device, {})
+        for day, counts in days.items():
+            if day not in mine or sum(counts) > sum(mine[day]):
+                mine[day] = list(counts)
+                changed = True
+
+    log = sorted({tuple(e) for e in local["wrong_log"] + remote.get("wrong_log", [])})
+    log = [list(e) for e in log][-WRONG_LOG_SIZE:]
+    if log != local["wrong_log"]:
+        local["wrong_log"] = log
+        changed = True
+
+    if "generator" in remote and "generator" not in local:
+        local["generator"] = remote["generator"]
+        changed = True
+    if remote.get("last", 0) > local.get("last", 0):
+        local["last"] = remote["last"]
+        changed = True
+    return changed
+
 
-    db[key] = rec
-    save_progress(folder, db)
+def _newer_mastery(a, b):
+    """True if mastery entry `a` holds more answers than `b` (both decayed to the later time)."""
+    at = max(a[2], b[2])
+    # sums replayed in another order differ in the last bits, that is not news
+    return a[1] * _decay(at - a[2]) > b[1] * _decay(at - b[2]) * (1 + 1e-9)
@@ -0,0 +1,172 @@
+import argparse
+import gzip
+import json
+
+from stats_utils import load_progress, save_progress, merge_record, new_record, touch_record
+
+# -----------------------------------------------
+# Delta sync of progress DBs between machines
+#
+#   python sync_utils.py export demo -o laptop.delta
+#   python sync_utils.py import demo laptop.delta
+#   python sync_utils.py merge a.delta b.delta -o ab.delta
+#
+# A delta holds the records changed since a given DB "seq". Records carry
+# per-device counters, so importing a delta twice, in any order or after
+# merging it with others always ends up with the same counts.
+# -----------------------------------------------
+
+DELTA_FORMAT = "procknow-delta"
+DELTA_VERSION = 1
+
+
+def export_delta(db, since=0):
+    """
+    Return the records changed after `since`.
+
+    Tables are ordered by seq, so this walks back from the end and only
+    touches the changed records.
+    """
+    delta = {
+        "format": DELTA_FORMAT,
+        "version": DELTA_VERSION,
+        "since": since,
+        "until": db["seq"],
+    }
+    for name in ("generators", "instances"):
+        table = db[name]
+        changed = {}
+        for key in reversed(table):
+            rec = table[key]
+            if rec["seq"] <= since:
+                break
+            changed[key] = rec
+        delta[name] = dict(reversed(changed.items()))
+    return delta
+
+
+def apply_delta(db, delta):
+    """Merge a delta into `db`. Returns the number of records that changed."""
+    _check_delta(delta)
+    changed = 0
+    for name in ("generators", "instances"):
+        table = db[name]
+        for key, remote in delta[name].items():
+            rec = table.get(key) or new_record()
+            if merge_record(rec, remote):
+                touch_record(db, table, key, rec)
+                changed += 1
+    return changed
+
+
+def merge_deltas(a, b):
+    """Combine two deltas into one, e.g. to pass both on to a third machine."""
+    _check_delta(a)
+    _check_delta(b)
+    out = {
+        "format": DELTA_FORMAT,
+        "version": DELTA_VERSION,
+        "since": min(a["since"], b["since"]),
+        "until": max(a["until"], b["until"]),
+    }
+    for name in ("generators", "instances"):
+        table = {k: _copy_record(v) for k, v in a[name].items()}
+        for key, remote in b[name].items():
+            if key in table:
+                merge_record(table[key], remote)
+            else:
+                table[key] = _copy_record(remote)
+        out[name] = table
+    return out
+
+
+def _copy_record(rec):
+    rec = dict(rec)
+    rec["devices"] = {d: list(c) for d, c in rec.get("devices", {}).items()}
+    rec["wrong_log"] = [list(e) for e in rec.get("wrong_log", [])]
+    if "days" in rec:
+        rec["days"] = {d: {day: list(c) for day, c in days.items()} for d, days in rec["days"].items()}
+    if "mastery" in rec:
+        rec["mastery"] = {d: list(e) for d, e in rec["mastery"].items()}
+    return rec
+
+
+def _check_delta(delta):
+    if delta.get("format") != DELTA_FORMAT or delta.get("version") != DELTA_VERSION:
+        raise ValueError("Not a progress delta (or a newer version of one).")
+
+
+def write_delta(path, delta):
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump(delta, f, separators=(",", ":"))
+
+
+def read_delta(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# -------------------------------------------------------
+# CLI
+# -------------------------------------------------------
+
+def cmd_export(args):
+    db = load_progress(args.folder)
+    # remember what we handed out, so the next export only has what is new
+    since = args.since if args.since is not None else db.get("last_export", 0)
+    delta = export_delta(db, since)
+    write_delta(args.output, delta)
+    n = len(delta["generators"]) + len(delta["instances"])
+    print(f"Exported {n} records (seq {since} -> {delta['until']}) to {args.output}")
+    if args.since is None:
+        db["last_export"] = delta["until"]
+        save_progress(args.folder, db)
+        # the bookmark must be stored, or the next export repeats this one
+        stored = load_progress(args.folder)
+        left = export_delta(stored, stored.get("last_export", 0))
+        if left["generators"] or left["instances"]:
+            raise SystemExit(f"Export bookmark not stored: the next export would repeat "
+                             f"{len(left['generators']) + len(left['instances'])} records.")
+
+
+def cmd_import(args):
+    db = load_progress(args.folder)
+    changed = 0
+    for path in args.deltas:
+        changed += apply_delta(db, read_delta(path))
+    save_progress(args.folder, db)
+    print(f"Merged {len(args.deltas)} delta(s), {changed} records changed.")
+
+
+def cmd_merge(args):
+    delta = read_delta(args.deltas[0])
+    for path in args.deltas[1:]:
+        delta = merge_deltas(delta, read_delta(path))
+    write_delta(args.output, delta)
+    n = len(delta["generators"]) + len(delta["instances"])
+    print(f"Wrote {n} records to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync progress between machines with delta files.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("export", help="write the changes of a folder's progress to a delta file")
+    p.add_argument("folder")
+    p.add_argument("-o", "--output", required=True)
+    p.add_argument("--since", type=int, default=None,
+                   help="export changes after this seq (default: since the last export)")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("import", help="merge delta files into a folder's progress")
+    p.add_argument("folder")
+    p.add_argument("deltas", nargs="+")
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("merge", help="combine delta files offline")
+    p.add_argument("deltas", nargs="+")
+    p.add_argument("-o", "--output", required=True)
+    p.set_defaults(func=cmd_merge)
+
+    args = parser.parse_args()
+    args.func(args)
@@ -0,0 +1,95 @@
+import asyncio, os, sys, threading, time, types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import card_utils
+from card_utils import submit_card
+
+# -------------------------------------------------------
+# Async card generators against a local stand-in server
+#
+#   python -m pytest tests/
+#
+# The stand-in answers GET /answer?word=..&delay=.. after `delay` seconds,
+# like a local model server would. The generators below talk to it over
+# plain asyncio streams.
+# -------------------------------------------------------
+
+TOPIC = "standin.async_topic"
+
+
+class StandIn(BaseHTTPRequestHandler):
+    def do_GET(self):
+        query = parse_qs(urlsplit(self.path).query)
+        time.sleep(float(query.get("delay", ["0"])[0]))
+        body = query.get("word", [""])[0].upper().encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    httpd.daemon_threads = True
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address
+    httpd.shutdown()
+    httpd.server_close()
+
+
+async def ask(address, word, delay):
+    reader, writer = await asyncio.open_connection(*address)
+    writer.write(f"GET /answer?word={word}&delay={delay} HTTP/1.0\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return response.split(b"\r\n\r\n", 1)[1].decode()
+
+
+def topic(address, delay):
+    """A topic module with one async generator per word."""
+    mod = types.ModuleType(TOPIC)
+    for word in ("sonar", "hatch", "rudder", "anchor", "ballast"):
+        async def gen(word=word):
+            answer = await ask(address, word, delay)
+            return {"name": f"upper_{word}", "question": f"Upper case of {word}?",
+                    "data_type": "string", "answer": answer, "comparison": "exact"}
+        gen.__name__ = f"upper_{word}"
+        setattr(mod, gen.__name__, gen)
+    return mod
+
+
+def test_cards_generate_concurrently(server):
+    delay = 0.5
+    mod = topic(server, delay)
+    names = card_utils.generator_names(mod)
+    t0 = time.perf_counter()
+    futures = [submit_card(TOPIC, name, mod) for name in names]
+    cards = [fut.result(10) for fut in futures]
+    elapsed = time.perf_counter() - t0
+
+    assert [c["answer"] for c in cards] == [n[len("upper_"):].upper() for n in names]
+    assert all(c["topic"] == TOPIC and c["_seed"] is None for c in cards)
+    assert elapsed < 2 * delay, f"{len(names)} cards took {elapsed:.2f}s, not run concurrently"
+
+
+def test_slow_card_times_out(server, monkeypatch):
+    monkeypatch.setattr(card_utils, "ASYNC_TIMEOUT", 0.3)
+    mod = topic(server, 3.0)
+    fut = submit_card(TOPIC, "upper_sonar", mod)
+    with pytest.raises(TimeoutError):
+        fut.result(5)
+
+    # the loop is not stuck behind the abandoned call
+    fast = submit_card(TOPIC, "upper_hatch", topic(server, 0))
+    assert fast.result(5)["answer"] == "HATCH"
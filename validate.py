@@ -0,0 +1,224 @@
+import argparse, asyncio, inspect, json, re, sys, time
+from collections import Counter
+from contextlib import redirect_stdout
+
+import numpy as np
+
+from card_utils import (
+    REQUIRED_KEYS, ASYNC_TIMEOUT, ARRAY_TYPES, list_folders, list_topics, import_topic,
+    generator_names, compare, parse_tolerance, compose_text,
+)
+
+# -------------------------------------------------------
+# Deck validator
+#
+#   python validate.py [folder ...] [-n 20] [--processes N] [--json]
+#
+# Imports every topic under learn/ and calls each generator n times in
+# warm worker processes (worker_pool.py), checking what load_cards would
+# otherwise drop or only print: exceptions, missing keys, data_type /
+# comparison mismatches, answers failing their own check, formulas that
+# do not render, names that do not tell instances apart, and slow calls.
+# Exits with 1 if any generator has errors.
+# -------------------------------------------------------
+
+CALLS = 20            # calls per generator
+SLOW_MS = 500.0       # warn above this per call
+KNOWN_TYPES = ("int", "float", "string") + ARRAY_TYPES
+TOL_RE = re.compile(r"tol=(.+)")
+
+
+def check_card(data):
+    """Problems of one generated card as (level, message) pairs."""
+    if not isinstance(data, dict):
+        return [("error", f"returns {type(data).__name__}, not a card dict (skipped when loading)")]
+    missing = [k for k in REQUIRED_KEYS if k not in data]
+    if missing:
+        return [("error", f"missing keys: {', '.join(missing)} (skipped when loading)")]
+
+    problems = []
+    data_type, comparison = data["data_type"], data["comparison"]
+    if data_type not in KNOWN_TYPES:
+        problems.append(("warning", f"unknown data_type {data_type!r}, compared as a string"))
+    if data_type == "float":
+        m = TOL_RE.fullmatch(str(comparison).strip())
+        try:
+            float(m.group(1))
+        except (AttributeError, ValueError):
+            problems.append(("error", f"float card needs comparison 'tol=<number>', got {comparison!r}"))
+    elif data_type == "int" and comparison != "exact":
+        problems.append(("warning", f"int cards are compared exactly, comparison {comparison!r} is ignored"))
+    elif data_type in ARRAY_TYPES:
+        try:
+            parse_tolerance(comparison)
+            answer = np.asarray(data["answer"], dtype=float)
+        except (ValueError, TypeError) as e:
+            return problems + [("error", f"{data_type} card cannot be graded: {e}")]
+        if data_type == "matrix" and answer.ndim != 2:
+            problems.append(("error", f"matrix answer has {answer.ndim} dimensions"))
+
+    if not compare(_as_input(data), data):
+        problems.append(("error", f"answer {str(data['answer'])[:40]!r} fails its own comparison"))
+
+    for key in ("question", "hint"):
+        if not isinstance(data.get(key, ""), str):
+            problems.append(("error", f"{key} is not a string"))
+            continue
+        for seg in compose_text(data.get(key, "")):
+            if seg[0] == "math" and seg[1] is None:
+                problems.append(("error", f"formula in {key} does not render: {seg[2][:60]}"))
+    return problems
+
+
+def _as_input(data):
+    """The answer typed the way a user would enter it."""
+    if data["data_type"] in ARRAY_TYPES:
+        rows = np.atleast_2d(np.asarray(data["answer"], dtype=float))
+        return "; ".join(" ".join(repr(float(x)) for x in row) for row in rows)
+    return str(data["answer"])
+
+
+def check_generator(full_topic_path, func_name, calls=CALLS):
+    """Call one generator `calls` times; runs inside a worker process."""
+    # whatever generators or the renderer print must not end up in a --json report
+    with redirect_stdout(sys.stderr):
+        return _check_generator(full_topic_path, func_name, calls)
+
+
+def _check_generator(full_topic_path, func_name, calls):
+    mod = import_topic(full_topic_path)
+    func = getattr(mod, func_name)
+    problems = Counter()
+    names, questions, times = set(), set(), []
+
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        try:
+            if inspect.iscoroutinefunction(func):
+                data = asyncio.run(asyncio.wait_for(func(), ASYNC_TIMEOUT))
+            else:
+                data = func()
+        except Exception as e:
+            problems[("error", f"raised {type(e).__name__}: {e}")] += 1
+            continue
+        finally:
+            times.append((time.perf_counter() - t0) * 1000)
+        for problem in check_card(data):
+            problems[problem] += 1
+        if isinstance(data, dict) and "name" in data:
+            names.add(str(data["name"]))
+            questions.add(str(data.get("question")))
+
+    return {
+        "topic": full_topic_path,
+        "generator": func_name,
+        "calls": calls,
+        "problems": [
+            {"level": level, "message": msg, "count": n}
+            for (level, msg), n in problems.most_common()
+        ],
+        "names": len(names),
+        "questions": len(questions),
+        "ms_mean": sum(times) / len(times),
+        "ms_max": max(times),
+    }
+
+
+def finish_result(res, slow_ms):
+    """Checks across calls (names, timing); helpers get warnings instead of errors."""
+    if res["names"] < res["questions"]:
+        res["problems"].append({
+            "level": "warning", "count": res["calls"],
+            "message": f"{res['questions']} different questions share {res['names']} names "
+                       f"(progress of different instances is mixed up)",
+        })
+    if res["ms_max"] > slow_ms:
+        res["problems"].append({
+            "level": "warning", "count": 1,
+            "message": f"slow: up to {res['ms_max']:.0f} ms per call",
+        })
+    # load_cards calls every function of a topic, helpers included
+    if res["generator"].startswith("_"):
+        for p in res["problems"]:
+            if p["level"] == "error" and res["names"] == 0:
+                p["level"] = "warning"
+                p["message"] = "helper called as a generator: " + p["message"]
+    res["ok"] = not any(p["level"] == "error" for p in res["problems"])
+    return res
+
+
+def failed_result(full_topic_path, func_name, calls, message):
+    return {
+        "topic": full_topic_path, "generator": func_name, "calls": calls,
+        "problems": [{"level": "error", "message": message, "count": 1}],
+        "names": 0, "questions": 0, "ms_mean": 0.0, "ms_max": 0.0, "ok": False,
+    }
+
+
+def collect_generators(folders):
+    """[(topic, generator name)] and results for topics that do not import."""
+    jobs, failures = [], []
+    for folder in folders:
+        for topic in list_topics(folder):
+            full_topic = f"{folder}.{topic}"
+            try:
+                with redirect_stdout(sys.stderr):
+                    mod = import_topic(full_topic)
+            except Exception as e:
+                failures.append(failed_result(full_topic, "(import)", 0, f"import failed: {type(e).__name__}: {e}"))
+                continue
+            jobs.extend((full_topic, name) for name in generator_names(mod))
+    return jobs, failures
+
+
+def validate(folders, calls=CALLS, processes=None, timeout=None):
+    from worker_pool import WorkerPool, CALL_TIMEOUT
+
+    jobs, results = collect_generators(folders)
+    pool = WorkerPool(processes)
+    try:
+        futures = [
+            (topic, name, pool.call(check_generator, topic, name, calls,
+                                    timeout=timeout or calls * CALL_TIMEOUT))
+            for topic, name in jobs
+        ]
+        for topic, name, fut in futures:
+            try:
+                results.append(fut.result())
+            except Exception as e:
+                results.append(failed_result(topic, name, calls, f"{type(e).__name__}: {e}"))
+    finally:
+        pool.close()
+    return results
+
+
+def print_report(results, elapsed):
+    for res in sorted(results, key=lambda r: (r["topic"], r["generator"])):
+        mark = "ok  " if res["ok"] else "FAIL"
+        print(f"{mark} {res['topic']}.{res['generator']}  "
+              f"[{res['names']} names, {res['ms_mean']:.1f} ms/call]")
+        for p in res["problems"]:
+            print(f"       {p['level']}: {p['message']} ({p['count']}/{res['calls'] or 1})")
+    failed = sum(not r["ok"] for r in results)
+    warned = sum(r["ok"] and bool(r["problems"]) for r in results)
+    print(f"\n{len(results)} generators checked in {elapsed:.1f}s: "
+          f"{failed} failing, {warned} with warnings")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check every card generator under learn/.")
+    parser.add_argument("folders", nargs="*", help="folders to check (default: all)")
+    parser.add_argument("-n", "--calls", type=int, default=CALLS, help="calls per generator")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--slow-ms", type=float, default=SLOW_MS, help="warn about calls slower than this")
+    parser.add_argument("--json", action="store_true", help="print a JSON report instead")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    results = [finish_result(r, args.slow_ms) for r in validate(args.folders or list_folders(), args.calls, args.processes)]
+    if args.json:
+        json.dump({"elapsed": time.perf_counter() - t0, "results": results}, sys.stdout, indent=1)
+        print()
+    else:
+        print_report(results, time.perf_counter() - t0)
+    sys.exit(0 if all(r["ok"] for r in results) else 1)
@@ -0,0 +1,178 @@
+import importlib, inspect, multiprocessing, os, queue, threading
+from concurrent.futures import ThreadPoolExecutor
+
+# -----------------------------------------------
+# Warm worker processes for card generators
+#
+# An optional backend for card_utils (see use_worker_pool): generators
+# run in long-lived processes that keep their topic modules and heavy
+# libraries imported, cards come back over a pipe. Calls time out, a
+# crashed or hung worker is replaced, and a topic's generators run in
+# parallel across the workers.
+# -----------------------------------------------
+
+PRELOAD = ("numpy", "scipy.stats")   # imported by every worker at start
+CALL_TIMEOUT = 10.0                  # seconds per generator call
+STARTUP_TIMEOUT = 60.0               # seconds a new worker may take to import PRELOAD
+
+
+def _import_all(names):
+    from card_utils import import_topic
+    for name in names:
+        try:
+            if name.startswith("topic:"):
+                import_topic(name[len("topic:"):])
+            else:
+                importlib.import_module(name)
+        except Exception as e:
+            print("Worker preload:", name, e)
+
+
+def _fresh_topic(full_topic_path, versions):
+    """The topic module, reloaded when its file changed since the last call."""
+    from card_utils import import_topic, _module_version
+    mod = import_topic(full_topic_path)
+    version = _module_version(mod)
+    if versions.setdefault(mod.__name__, version) != version:
+        mod = importlib.reload(mod)
+        versions[mod.__name__] = version
+    return mod
+
+
+def _worker_main(conn, preload):
+    """Worker loop: answer ("card", topic, func_name, seed), ("import", names) and ("call", func, args) jobs."""
+    import asyncio
+    from card_utils import call_generator, new_seed, seed_generators, _run_async, _tag_card
+
+    _import_all(preload)
+    conn.send(("ready", None))
+    versions = {}
+
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        try:
+            if job[0] == "import":
+                _import_all(job[1])
+                result = None
+            elif job[0] == "call":
+                result = job[1](*job[2])
+            else:
+                _, full_topic_path, func_name, seed = job
+                mod = _fresh_topic(full_topic_path, versions)
+                func = getattr(mod, func_name)
+                if inspect.iscoroutinefunction(func):
+                    result = asyncio.run(_run_async(func, full_topic_path, func_name))
+                else:
+                    # time and pid differ per worker, so do the fresh seeds
+                    seed = new_seed() if seed is None else seed
+                    seed_generators(seed)
+                    result = _tag_card(call_generator(mod, func_name, func), full_topic_path, func_name, seed)
+            conn.send(("ok", result))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class WorkerCrashed(RuntimeError):
+    pass
+
+
+class _Worker:
+    def __init__(self, ctx, preload):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child, preload), daemon=True)
+        self.process.start()
+        child.close()
+        self.ready = False
+
+    def call(self, job, timeout):
+        if not self.ready:
+            # the call timeout starts once the imports are done
+            if not self.conn.poll(STARTUP_TIMEOUT):
+                raise TimeoutError(f"worker not ready after {STARTUP_TIMEOUT:g}s")
+            self.conn.recv()
+            self.ready = True
+        self.conn.send(job)
+        if not self.conn.poll(timeout):
+            raise TimeoutError(f"timed out after {timeout:g}s")
+        status, result = self.conn.recv()   # EOFError if the worker died
+        if status == "error":
+            raise RuntimeError(result)
+        return result
+
+    def stop(self):
+        self.conn.close()
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(1)
+
+
+class WorkerPool:
+    """
+    A fixed number of generator processes. `submit` returns a
+    concurrent.futures.Future of the card, like card_utils.submit_card.
+    """
+
+    def __init__(self, size=None, preload=PRELOAD, timeout=CALL_TIMEOUT, start_method="spawn"):
+        self.size = size or os.cpu_count() or 1
+        self.timeout = timeout
+        self.preload = list(preload)
+        self.ctx = multiprocessing.get_context(start_method)
+        self.idle = queue.Queue()
+        for _ in range(self.size):
+            self.idle.put(_Worker(self.ctx, self.preload))
+        # one thread per worker waits on its pipe
+        self.dispatch = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="worker-pipe")
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _run(self, job):
+        worker = self.idle.get()
+        try:
+            if not worker.process.is_alive():
+                worker.stop()
+                worker = _Worker(self.ctx, self.preload)
+            try:
+                return worker.call(job[:-1], job[-1] or self.timeout)
+            except TimeoutError:
+                worker.stop()          # hung: it cannot be interrupted otherwise
+                worker = _Worker(self.ctx, self.preload)
+                raise
+            except (EOFError, OSError) as e:
+                worker.stop()
+                worker = _Worker(self.ctx, self.preload)
+                raise WorkerCrashed(f"worker died running {job[1:-1]}") from e
+        finally:
+            with self._lock:
+                if self._closed:
+                    worker.stop()
+                else:
+                    self.idle.put(worker)
+
+    def submit(self, full_topic_path, func_name, seed=None):
+        return self.dispatch.submit(self._run, ("card", full_topic_path, func_name, seed, None))
+
+    def warm(self, full_topic_paths):
+        """Import topic modules in all workers ahead of their first card."""
+        names = [f"topic:{p}" for p in full_topic_paths]
+        self.preload.extend(n for n in names if n not in self.preload)
+        return [self.dispatch.submit(self._run, ("import", names, None)) for _ in range(self.size)]
+
+    def call(self, func, *args, timeout=None):
+        """
+        Run a module-level function in a worker; Future of its result.
+        `timeout` (seconds) defaults to the pool's per-call timeout.
+        """
+        return self.dispatch.submit(self._run, ("call", func, args, timeout))
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        self.dispatch.shutdown(wait=False, cancel_futures=True)
+        while True:
+            try:
+                self.idle.get_nowait().stop()
+            except queue.Empty:
+                break